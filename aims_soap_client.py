@@ -4,52 +4,177 @@ Kết nối AIMS Web Service (SOAP 1.1) để lấy dữ liệu phi hành đoàn
 """
 
 import os
+import tempfile
+import copy
 import logging
+from logging.handlers import RotatingFileHandler
+import random
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
-from functools import wraps
+from functools import lru_cache, wraps
+from operator import attrgetter
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
-# Load environment variables from .env file
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('aims_errors.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger('AIMSSoapClient')
-
-# Try to import zeep, provide fallback message if not installed
-try:
-    from zeep import Client
-    from zeep.transports import Transport
-    from zeep.exceptions import Fault, TransportError
-    from requests import Session
-    from requests.exceptions import RequestException
-    ZEEP_AVAILABLE = True
-except ImportError:
-    ZEEP_AVAILABLE = False
-    logger.warning("zeep not installed. Run: pip install zeep")
-
-try:
-    import pytz
-    PYTZ_AVAILABLE = True
-except ImportError:
-    PYTZ_AVAILABLE = False
-    logger.warning("pytz not installed. Run: pip install pytz")
-
-
-def retry_on_failure(max_retries: int = 3, base_delay: float = 1.0):
-    """Decorator for retry logic with exponential backoff"""
+from utils.date_utils import parse_time_to_minutes
+
+logger = logging.getLogger(__name__)
+_LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+_file_logging_configured = False
+
+
+def _log_file_handler(log_file: str) -> RotatingFileHandler:
+    """Size-bounded log file handler with the module's format"""
+    handler = RotatingFileHandler(log_file, maxBytes=10_000_000, backupCount=3)
+    handler.setFormatter(logging.Formatter(_LOG_FORMAT))
+    return handler
+
+
+def _env_log_file() -> Optional[str]:
+    """AIMS_LOG_TO_FILE as a path - '1'/'true' means the default file name"""
+    log_file = os.getenv('AIMS_LOG_TO_FILE')
+    if log_file and log_file.lower() in ('1', 'true', 'yes'):
+        return 'aims_errors.log'
+    return log_file or None
+
+
+def _configure_logging():
+    """Attach a rotating file handler - only when AIMS_LOG_TO_FILE is set"""
+    global _file_logging_configured
+    log_file = _env_log_file()
+    if _file_logging_configured or not log_file:
+        return
+    logger.addHandler(_log_file_handler(log_file))
+    _file_logging_configured = True
+
+
+def setup_logging(log_file: Optional[str] = None):
+    """
+    Console + aims_errors.log logging for entry points (CLI, api_server)
+    
+    Importing this module configures nothing; entry points call this to get the
+    INFO console output and error log file the module used to set up on import.
+    log_file defaults to AIMS_LOG_TO_FILE, else aims_errors.log.
+    """
+    global _file_logging_configured
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=logging.INFO, format=_LOG_FORMAT)
+    if _file_logging_configured:
+        return
+    log_file = log_file or _env_log_file() or 'aims_errors.log'
+    try:
+        root.addHandler(_log_file_handler(log_file))
+        _file_logging_configured = True
+    except OSError as e:
+        # Read-only filesystem (serverless) - console logging still works
+        logger.warning(f"Cannot write AIMS log file {log_file}: {e}")
+
+# zeep / requests / pytz / dotenv are imported on first use, not at module import,
+# so importing this module (e.g. for is_aims_available) stays cheap.
+ZEEP_AVAILABLE = None   # None = not checked yet
+PYTZ_AVAILABLE = None
+_SHARED_SESSION = None
+_GMT7 = None
+_UTC = None
+_env_loaded = False
+_import_lock = threading.Lock()
+
+
+def _load_env():
+    """Load environment variables from .env file (once)"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    _env_loaded = True
+
+
+def _ensure_zeep() -> bool:
+    """Import zeep + requests and build the shared session on first call"""
+    global ZEEP_AVAILABLE, Client, Settings, SqliteCache, Transport, Fault, TransportError
+    global Session, HTTPAdapter, RequestException, _SHARED_SESSION
+    if ZEEP_AVAILABLE is not None:
+        return ZEEP_AVAILABLE
+    
+    with _import_lock:
+        if ZEEP_AVAILABLE is not None:
+            return ZEEP_AVAILABLE
+        try:
+            from zeep import Client, Settings
+            from zeep.cache import SqliteCache
+            from zeep.transports import Transport
+            from zeep.exceptions import Fault, TransportError
+            from requests import Session
+            from requests.adapters import HTTPAdapter
+            from requests.exceptions import RequestException
+            
+            # One pooled keep-alive session for every SOAP call in this process
+            _SHARED_SESSION = Session()
+            _SHARED_SESSION.verify = True  # SSL verification
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0)
+            _SHARED_SESSION.mount('http://', adapter)
+            _SHARED_SESSION.mount('https://', adapter)
+            ZEEP_AVAILABLE = True
+        except ImportError:
+            ZEEP_AVAILABLE = False
+            logger.warning("zeep not installed. Run: pip install zeep")
+    return ZEEP_AVAILABLE
+
+
+def _ensure_pytz() -> bool:
+    """Import pytz and resolve the Vietnam timezone on first call"""
+    global PYTZ_AVAILABLE, _GMT7, _UTC
+    if PYTZ_AVAILABLE is not None:
+        return PYTZ_AVAILABLE
+    try:
+        import pytz
+        # Timezone for Vietnam - resolved once per process
+        _GMT7 = pytz.timezone('Asia/Ho_Chi_Minh')
+        _UTC = pytz.UTC
+        PYTZ_AVAILABLE = True
+    except ImportError:
+        PYTZ_AVAILABLE = False
+        logger.warning("pytz not installed. Run: pip install pytz")
+    return PYTZ_AVAILABLE
+
+
+@lru_cache(maxsize=4096)
+def _utc_to_gmt7(utc_dt: datetime) -> datetime:
+    """Cached UTC -> GMT+7 conversion (roster timestamps repeat across crew)"""
+    if utc_dt.tzinfo is None:
+        utc_dt = _UTC.localize(utc_dt)
+    return utc_dt.astimezone(_GMT7)
+
+
+# Fault text that means retrying cannot help (bad credentials / access denied)
+_AUTH_FAULT_MARKERS = ('auth', 'login', 'password', 'credential', 'access denied', 'unauthori')
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Return False for errors that will fail the same way on every attempt"""
+    if isinstance(error, ImportError):
+        return False
+    if ZEEP_AVAILABLE and isinstance(error, Fault):  # Fault is bound once zeep is loaded
+        text = f"{error.code or ''} {error.message or ''}".lower()
+        return not any(marker in text for marker in _AUTH_FAULT_MARKERS)
+    return True
+
+
+def _backoff_delay(attempt: int, base_delay: float, max_delay: float, jitter: float) -> float:
+    """Capped exponential backoff with random jitter"""
+    return min(max_delay, base_delay * (2 ** attempt)) * (1 + random.uniform(0, jitter))
+
+
+def retry_on_failure(max_retries: int = 3, base_delay: float = 1.0,
+                     max_delay: float = 30.0, jitter: float = 0.5):
+    """Decorator for retry logic with capped exponential backoff and jitter"""
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -59,8 +184,13 @@ def retry_on_failure(max_retries: int = 3, base_delay: float = 1.0):
                     return func(*args, **kwargs)
                 except Exception as e:
                     last_exception = e
-                    delay = base_delay * (2 ** attempt)
-                    logger.warning(f"Attempt {attempt + 1}/{max_retries} failed: {e}. Retrying in {delay}s...")
+                    if not _is_retryable(e):
+                        logger.error(f"Non-retryable error in {func.__name__}: {e}")
+                        raise
+                    if attempt + 1 >= max_retries:
+                        break
+                    delay = _backoff_delay(attempt, base_delay, max_delay, jitter)
+                    logger.warning(f"Attempt {attempt + 1}/{max_retries} failed: {e}. Retrying in {delay:.1f}s...")
                     time.sleep(delay)
             logger.error(f"All {max_retries} attempts failed for {func.__name__}")
             raise last_exception
@@ -68,6 +198,175 @@ def retry_on_failure(max_retries: int = 3, base_delay: float = 1.0):
     return decorator
 
 
+_AIMS_DATE_FORMATS = ('%d/%m/%y', '%d/%m/%Y', '%Y-%m-%d')
+
+
+def _aims_date_format(date_str: str) -> Optional[str]:
+    """Pick the strptime format from the shape of an AIMS date string"""
+    if len(date_str) == 10 and date_str[4] == '-':
+        return '%Y-%m-%d'
+    if '/' in date_str:
+        # Year part decides YY vs YYYY (day/month may be unpadded)
+        return '%d/%m/%Y' if len(date_str.rsplit('/', 1)[1]) == 4 else '%d/%m/%y'
+    return None
+
+
+@lru_cache(maxsize=8192)
+def _parse_aims_datetime_cached(date_str: str, time_str: str) -> Optional[str]:
+    """Parse stripped AIMS date/time strings to ISO (dates repeat across crew/legs)"""
+    value = f"{date_str} {time_str}"
+    fmt = _aims_date_format(date_str)
+    if fmt:
+        try:
+            return datetime.strptime(value, f"{fmt} %H:%M").isoformat()
+        except ValueError:
+            pass
+    
+    # Unusual shape - fall back to trying every known format
+    for fmt in _AIMS_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, f"{fmt} %H:%M").isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+# Response field extractors - one C-level attrgetter call per item instead of
+# a getattr() per field. Defaults are only used when zeep omits an attribute.
+# Parsed items stay plain dicts on purpose: data_processor / etl_scheduler read
+# them with .get() and add keys (e.g. 'dep_actual_dt_local'), and they are
+# serialized to JSON / Supabase as-is.
+_ROSTER_FIELDS = ('CrewId', 'Flt', 'Day', 'STD', 'STA', 'ATD', 'ATA',
+                  'Dep', 'Arr', 'Carrier', 'CROUTE', 'CrewBase')
+_ROSTER_DEFAULTS = ('', 'UNKNOWN', '', '00:00', '00:00', '', '', '', '', '', '', '')
+_ROSTER_GETTER = attrgetter(*_ROSTER_FIELDS)
+
+_FLIGHT_FIELDS = ('FlightDD', 'FlightMM', 'FlightYY', 'FlightCarrier', 'FlightNo',
+                  'FlightReg', 'FlightDep', 'FlightArr', 'FlightStatus', 'FlightAcType',
+                  'FlightStd', 'FlightSta', 'FlightAtd', 'FlightAta')
+_FLIGHT_GETTER = attrgetter(*_FLIGHT_FIELDS)
+
+_CREW_FIELDS = ('Id', 'CrewName', 'ShortName', 'Quals', 'Email', 'Location',
+                'Nationality', 'EmploymentDate', 'ContactCell')
+_CREW_GETTER = attrgetter(*_CREW_FIELDS)
+
+_LEG_FIELDS = ('FlightNo', 'FlightCarrier', 'FlightDep', 'FlightArr',
+               'FlightDD', 'FlightMM', 'FlightYY', 'FlightStatus')
+_LEG_GETTER = attrgetter(*_LEG_FIELDS)
+
+_MEMBER_FIELDS = ('id', 'name', 'pos', 'crte', 'base')
+_MEMBER_GETTER = attrgetter(*_MEMBER_FIELDS)
+
+
+def _get_fields(item, getter, fields, defaults=None) -> tuple:
+    """Pull all fields at once, falling back to per-field getattr if one is missing"""
+    try:
+        return getter(item)
+    except AttributeError:
+        defaults = defaults or ('',) * len(fields)
+        return tuple(getattr(item, f, d) for f, d in zip(fields, defaults))
+
+
+@lru_cache(maxsize=64)
+def _roster_date_kwargs(from_day, to_day) -> Dict[str, str]:
+    """CrewMemberRosterDetailsForPeriod date kwargs for a (from, to) window - do not mutate"""
+    return {
+        'FmDD': f"{from_day.day:02d}",
+        'FmMM': f"{from_day.month:02d}",
+        'FmYY': f"{from_day.year:04d}",
+        'ToDD': f"{to_day.day:02d}",
+        'ToMM': f"{to_day.month:02d}",
+        'ToYY': f"{to_day.year:04d}",
+    }
+
+
+# Roster activity code -> get_bulk_crew_status bucket
+_SL_CODES = frozenset(('SL', 'SICK', 'BN', 'OM'))
+_CSL_CODES = frozenset(('CSL', 'CSICK'))
+_STATUS_BUCKET = {
+    **dict.fromkeys(_SL_CODES, 'SL'),
+    **dict.fromkeys(_CSL_CODES, 'CSL'),
+    'SBY': 'SBY',
+    'OFF': 'OFF',
+}
+
+
+def _status_bucket(code: str) -> Optional[str]:
+    """Bucket for an upper-cased activity code, or None if it is not a status code"""
+    return _STATUS_BUCKET.get(code) or ('SBY' if 'STANDBY' in code else None)
+
+
+# Response cache TTLs (seconds) per @ttl_cache policy - 0 disables caching
+_CACHE_POLICY = {
+    'bulk_status': 30,
+    'crew_list': int(os.getenv('AIMS_CREWLIST_TTL', '300')),  # crew master data rarely changes
+    'schedule_changes': 60,
+}
+# Distinct (method, args) results kept per client; least recently used are dropped first
+_CACHE_MAX_ENTRIES = 128
+# A failed call falls back to a cached result at most this many TTLs old; past that the error surfaces
+_CACHE_MAX_STALE_FACTOR = 10
+
+
+def _cache_key(args: tuple, kwargs: dict) -> tuple:
+    """Hashable key for a cached call - datetimes collapse to their date (AIMS is day-granular)"""
+    def norm(value):
+        return value.date() if isinstance(value, datetime) else value
+    return tuple(norm(a) for a in args) + tuple(sorted((k, norm(v)) for k, v in kwargs.items()))
+
+
+def ttl_cache(policy: str):
+    """
+    Memoize an AIMSSoapClient method for _CACHE_POLICY[policy] seconds
+    
+    Only successful results are stored. When a fresh call fails (SOAP Fault
+    result or exception after retries) and an older result no more than
+    _CACHE_MAX_STALE_FACTOR x TTL old exists, that result is returned with
+    'stale': True instead of the error.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            ttl = _CACHE_POLICY.get(policy, 0)
+            key = (policy, func.__name__) + _cache_key(args, kwargs)
+            with self._cache_lock:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    self._cache.move_to_end(key)
+            if entry is not None:
+                age = time.monotonic() - entry[0]
+                if age < ttl:
+                    # Callers may mutate the result - never hand out the cached object
+                    return copy.deepcopy(entry[1])
+                if age >= ttl * _CACHE_MAX_STALE_FACTOR:
+                    entry = None  # too old to stand in for a failed call
+            
+            try:
+                result = func(self, *args, **kwargs)
+            except Exception:
+                if entry is None:
+                    raise
+                result = None
+            
+            if result is not None and result.get('success'):
+                if ttl > 0:
+                    with self._cache_lock:
+                        self._cache[key] = (time.monotonic(), copy.deepcopy(result))
+                        self._cache.move_to_end(key)
+                        while len(self._cache) > _CACHE_MAX_ENTRIES:
+                            self._cache.popitem(last=False)
+                return result
+            
+            if entry is not None:
+                logger.warning(f"{func.__name__} failed - serving stale cached result")
+                stale = copy.deepcopy(entry[1])
+                stale['stale'] = True
+                return stale
+            return result
+        return wrapper
+    return decorator
+
+
 class AIMSSoapClient:
     """
     AIMS Web Service SOAP Client
@@ -78,6 +377,30 @@ class AIMSSoapClient:
     - Danh sách phi hành đoàn (Crew List)
     """
     
+    # Parsed zeep Clients / service proxies shared across instances, keyed by
+    # (wsdl_url, timeout) since the transport carries the timeout.
+    # WSDL + XSD parsing dominates the first call, so do it once per process.
+    _CLIENT_CACHE: Dict[tuple, Any] = {}
+    _SERVICE_CACHE: Dict[tuple, Any] = {}
+    _CACHE_LOCK = threading.Lock()
+    
+    # On-disk WSDL/XSD cache so process restarts skip the download.
+    # Serverless (Vercel) only allows writes under /tmp, which survives warm invocations;
+    # elsewhere it sits next to this module, whatever the process working directory.
+    WSDL_CACHE_PATH = os.getenv('AIMS_WSDL_CACHE') or (
+        os.path.join(tempfile.gettempdir(), 'zeep_cache.db') if os.getenv('VERCEL')
+        else os.path.join(os.path.dirname(os.path.abspath(__file__)), '.zeep_cache.db')
+    )
+    WSDL_CACHE_TIMEOUT = int(os.getenv('AIMS_WSDL_CACHE_TIMEOUT', '86400'))  # 1 day
+    
+    # Concurrent roster calls for get_bulk_crew_status (<= shared pool_maxsize)
+    BULK_STATUS_WORKERS = 32
+    # Max crew whose roster is fetched per base (0 = all). AIMS has no per-base status op.
+    BULK_STATUS_MAX_CREW = int(os.getenv('AIMS_BULK_STATUS_MAX_CREW', '200'))
+    
+    # Lenient schema handling: AIMS WSDL has loose typing and large responses
+    ZEEP_SETTINGS = {'strict': False, 'xml_huge_tree': True, 'force_https': False}
+    
     def __init__(
         self,
         wsdl_url: str = None,
@@ -94,6 +417,8 @@ class AIMSSoapClient:
             password: Mật khẩu AIMS
             timeout: Timeout cho requests (seconds)
         """
+        _load_env()
+        
         # Load from environment if not provided
         self.wsdl_url = wsdl_url or os.getenv(
             'AIMS_WSDL_URL', 
@@ -106,42 +431,93 @@ class AIMSSoapClient:
         self._client = None
         self._service = None
         
-        # Timezone for Vietnam
-        self.gmt7 = pytz.timezone('Asia/Ho_Chi_Minh') if PYTZ_AVAILABLE else None
-        self.utc = pytz.UTC if PYTZ_AVAILABLE else None
+        # Response cache for @ttl_cache methods: {(policy, args): (stored_at, result)}
+        self._cache: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        _configure_logging()
+    
+    @property
+    def gmt7(self):
+        """Timezone for Vietnam (None if pytz is not installed)"""
+        _ensure_pytz()
+        return _GMT7
+    
+    @property
+    def utc(self):
+        _ensure_pytz()
+        return _UTC
         
     def _init_client(self):
         """Initialize SOAP client lazily"""
-        if not ZEEP_AVAILABLE:
+        if not _ensure_zeep():
             raise ImportError("zeep library not installed. Run: pip install zeep")
             
         if self._client is None:
             try:
-                session = Session()
-                session.verify = True  # SSL verification
-                transport = Transport(session=session, timeout=self.timeout)
-                
-                self._client = Client(self.wsdl_url, transport=transport)
-                
-                # Override service address if needed (fix for internal IP in WSDL)
-                # The WSDL returns 10.x.x.x which is not accessible. Force usage of the public URL.
-                if 'aimswebservice' in self.wsdl_url:
-                    endpoint = self.wsdl_url.split('?')[0]
-                    # Get the default binding (usually the first one)
-                    service = list(self._client.wsdl.services.values())[0]
-                    port = list(service.ports.values())[0]
-                    binding_name = port.binding.name
+                client_key = (self.wsdl_url, self.timeout)
+                with self._CACHE_LOCK:
+                    client = self._CLIENT_CACHE.get(client_key)
+                    if client is None:
+                        transport = Transport(
+                            cache=SqliteCache(path=self.WSDL_CACHE_PATH, timeout=self.WSDL_CACHE_TIMEOUT),
+                            session=_SHARED_SESSION,
+                            timeout=self.timeout
+                        )
+                        client = Client(
+                            self.wsdl_url,
+                            transport=transport,
+                            settings=Settings(**self.ZEEP_SETTINGS)
+                        )
+                        self._CLIENT_CACHE[client_key] = client
                     
-                    self._service = self._client.create_service(binding_name, endpoint)
-                    logger.info(f"Forced service endpoint to: {endpoint}")
-                else:
-                    self._service = self._client.service
+                    # Override service address if needed (fix for internal IP in WSDL)
+                    # The WSDL returns 10.x.x.x which is not accessible. Force usage of the public URL.
+                    if 'aimswebservice' in self.wsdl_url:
+                        endpoint = self.wsdl_url.split('?')[0]
+                        service = self._SERVICE_CACHE.get(client_key + (endpoint,))
+                        if service is None:
+                            # Get the default binding (usually the first one)
+                            wsdl_service = list(client.wsdl.services.values())[0]
+                            port = list(wsdl_service.ports.values())[0]
+                            binding_name = port.binding.name
+                            
+                            service = client.create_service(binding_name, endpoint)
+                            self._SERVICE_CACHE[client_key + (endpoint,)] = service
+                            logger.info(f"Forced service endpoint to: {endpoint}")
+                    else:
+                        service = client.service
+                    
+                    self._client = client
+                    self._service = service
                     
                 logger.info(f"AIMS SOAP Client initialized: {self.wsdl_url}")
             except Exception as e:
                 logger.error(f"Failed to initialize AIMS client: {e}")
                 raise
                 
+    def warmup_async(self) -> threading.Thread:
+        """
+        Build the zeep client in a background thread
+        
+        Call once at app startup so the first dashboard request does not pay
+        for the WSDL download/parse. Safe to call repeatedly.
+        """
+        thread = threading.Thread(target=self._warmup, name='aims-wsdl-warmup', daemon=True)
+        thread.start()
+        return thread
+    
+    def _warmup(self):
+        try:
+            self._init_client()
+        except Exception as e:
+            logger.warning(f"AIMS client warmup failed (will retry on first call): {e}")
+    
+    def close(self):
+        """Release this instance's client references (shared session stays open)"""
+        self._client = None
+        self._service = None
+    
     def is_configured(self) -> bool:
         """Check if credentials are configured"""
         return bool(self.username and self.password)
@@ -165,7 +541,7 @@ class AIMSSoapClient:
             'operations': []
         }
         
-        if not ZEEP_AVAILABLE:
+        if not _ensure_zeep():
             result['status'] = 'error'
             result['message'] = 'zeep library not installed'
             return result
@@ -193,10 +569,10 @@ class AIMSSoapClient:
     def _format_date_parts(self, date: datetime) -> Dict[str, str]:
         """Format datetime to AIMS date parts (DD, MM, YYYY)"""
         return {
-            'DD': date.strftime('%d'),
-            'MM': date.strftime('%m'),
-            'YYYY': date.strftime('%Y'),
-            'YY': date.strftime('%y')
+            'DD': f"{date.day:02d}",
+            'MM': f"{date.month:02d}",
+            'YYYY': f"{date.year:04d}",
+            'YY': f"{date.year % 100:02d}"
         }
     
     def convert_utc_to_gmt7(self, utc_dt: datetime) -> datetime:
@@ -209,20 +585,20 @@ class AIMSSoapClient:
         Returns:
             DateTime in GMT+7
         """
-        if not PYTZ_AVAILABLE:
+        if not _ensure_pytz():
             # Fallback: simple offset addition
             return utc_dt + timedelta(hours=7)
             
-        if utc_dt.tzinfo is None:
-            utc_dt = self.utc.localize(utc_dt)
-        return utc_dt.astimezone(self.gmt7)
+        return _utc_to_gmt7(utc_dt)
     
     @retry_on_failure(max_retries=3)
     def get_crew_roster(
         self, 
         crew_id: int,
         from_date: datetime,
-        to_date: datetime
+        to_date: datetime,
+        include_raw: bool = False,
+        codes_only: bool = False
     ) -> Dict[str, Any]:
         """
         Lấy lịch công tác phi hành đoàn (GetCrewSchedule)
@@ -239,60 +615,81 @@ class AIMSSoapClient:
             crew_id: Mã phi hành đoàn
             from_date: Ngày bắt đầu
             to_date: Ngày kết thúc
+            include_raw: Kèm '_raw' (STD/STA/ATD/ATA) cho tính block time
+            codes_only: Chỉ lấy crew_id + activity_type (bỏ parse ngày/block time)
             
         Returns:
             dict: Crew roster data với mapping fields
         """
         self._init_client()
         
-        from_parts = self._format_date_parts(from_date)
-        to_parts = self._format_date_parts(to_date)
+        # Date kwargs are shared by every crew queried over the same window (keyed by day; date or datetime accepted)
+        date_kwargs = _roster_date_kwargs(
+            from_date.date() if isinstance(from_date, datetime) else from_date,
+            to_date.date() if isinstance(to_date, datetime) else to_date,
+        )
         
         try:
             response = self._service.CrewMemberRosterDetailsForPeriod(
+                **date_kwargs,
                 UN=self.username,
                 PSW=self.password,
-                ID=crew_id,
-                FmDD=from_parts['DD'],
-                FmMM=from_parts['MM'],
-                FmYY=from_parts['YYYY'],
-                ToDD=to_parts['DD'],
-                ToMM=to_parts['MM'],
-                ToYY=to_parts['YYYY']
+                ID=crew_id
             )
             
+            roster_list = getattr(response, 'TAIMSCrewRostDetailList', None)
+            if not roster_list:
+                return {
+                    'success': True,
+                    'crew_id': crew_id,
+                    'from_date': from_date.isoformat(),
+                    'to_date': to_date.isoformat(),
+                    'count': 0,
+                    'items': [],
+                    'error': None
+                }
+            
             # Parse response and map to our schema
             roster_items = []
-            if hasattr(response, 'TAIMSCrewRostDetailList') and response.TAIMSCrewRostDetailList:
-                for item in response.TAIMSCrewRostDetailList.TAIMSCrewRostItm:
+            if codes_only:
+                # AIMS has no field filter, but status checks only need the activity code
+                roster_items = [
+                    {'crew_id': getattr(item, 'CrewId', crew_id), 'activity_type': getattr(item, 'Flt', 'UNKNOWN')}
+                    for item in roster_list.TAIMSCrewRostItm
+                ]
+            else:
+                roster_defaults = (crew_id,) + _ROSTER_DEFAULTS[1:]
+                for item in roster_list.TAIMSCrewRostItm:
+                    (item_crew_id, flt, day, std, sta, atd, ata,
+                     dep, arr, carrier, croute, crew_base) = _get_fields(
+                        item, _ROSTER_GETTER, _ROSTER_FIELDS, roster_defaults
+                    )
                     # Map AIMS fields to our schema
                     roster_item = {
-                        'crew_id': getattr(item, 'CrewId', crew_id),
-                        'activity_type': getattr(item, 'Flt', 'UNKNOWN'),  # Flight number as activity
-                        'start_dt': self._parse_aims_datetime(
-                            getattr(item, 'Day', ''),
-                            getattr(item, 'STD', '00:00')
-                        ),
-                        'end_dt': self._parse_aims_datetime(
-                            getattr(item, 'Day', ''),
-                            getattr(item, 'STA', '00:00')
-                        ),
-                        'departure': getattr(item, 'Dep', ''),
-                        'arrival': getattr(item, 'Arr', ''),
-                        'carrier': getattr(item, 'Carrier', ''),
-                        'route': getattr(item, 'CROUTE', ''),
-                        'crew_base': getattr(item, 'CrewBase', ''),
+                        'crew_id': item_crew_id,
+                        'activity_type': flt,  # Flight number as activity
+                        'start_dt': self._parse_aims_datetime(day, std),
+                        'end_dt': self._parse_aims_datetime(day, sta),
+                        'departure': dep,
+                        'arrival': arr,
+                        'carrier': carrier,
+                        'route': croute,
+                        'crew_base': crew_base,
+                        # Actual block time, falling back to scheduled times
+                        'block_minutes': self._calculate_block_minutes(atd or std, ata or sta),
+                    }
+                    if include_raw:
                         # Raw AIMS data for reference
-                        '_raw': {
-                            'STD': getattr(item, 'STD', ''),
-                            'STA': getattr(item, 'STA', ''),
-                            'ATD': getattr(item, 'ATD', ''),
-                            'ATA': getattr(item, 'ATA', ''),
+                        roster_item['_raw'] = {
+                            'STD': std,
+                            'STA': sta,
+                            'ATD': atd,
+                            'ATA': ata,
                         }
-                    }
                     roster_items.append(roster_item)
             
-            logger.info(f"Fetched {len(roster_items)} roster items for crew {crew_id}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"Fetched {len(roster_items)} roster items for crew {crew_id}")
             
             return {
                 'success': True,
@@ -310,7 +707,53 @@ class AIMSSoapClient:
         except Exception as e:
             logger.error(f"Error in get_crew_roster: {e}")
             raise
-    
+
+    def get_crew_rosters_bulk(
+        self,
+        crew_ids: List[int],
+        from_date: datetime,
+        to_date: datetime,
+        max_workers: int = 8,
+        codes_only: bool = False
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Lấy lịch công tác cho nhiều crew cùng lúc (song song)
+
+        Mỗi CrewMemberRosterDetailsForPeriod là một round-trip SOAP riêng,
+        nên chạy đồng thời trên session dùng chung thay vì tuần tự.
+
+        Args:
+            crew_ids: Danh sách mã phi hành đoàn
+            from_date: Ngày bắt đầu
+            to_date: Ngày kết thúc
+            max_workers: Số request đồng thời tối đa
+            codes_only: Chỉ lấy activity_type (xem get_crew_roster)
+
+        Returns:
+            dict: {crew_id: roster result} (cùng format với get_crew_roster)
+        """
+        # Build the shared service proxy before fanning out to worker threads
+        self._init_client()
+
+        results = {}
+        if not crew_ids:
+            return results
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.get_crew_roster, crew_id, from_date, to_date, codes_only=codes_only): crew_id
+                for crew_id in crew_ids
+            }
+            for future in as_completed(futures):
+                crew_id = futures[future]
+                try:
+                    results[crew_id] = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching roster for crew {crew_id}: {e}")
+                    results[crew_id] = {'success': False, 'error': str(e), 'items': []}
+
+        return results
+
     @retry_on_failure(max_retries=3)
     def get_flight_details(
         self,
@@ -355,43 +798,50 @@ class AIMSSoapClient:
                 ToMMin='59'
             )
             
+            flight_list = getattr(response, 'FlightList', None)
+            if not flight_list:
+                return {
+                    'success': True,
+                    'from_date': from_date.isoformat(),
+                    'to_date': to_date.isoformat(),
+                    'count': 0,
+                    'flights': [],
+                    'error': None
+                }
+            
             flights = []
-            if hasattr(response, 'FlightList') and response.FlightList:
-                for flight in response.FlightList.TAIMSFlight:
+            for flight in flight_list.TAIMSFlight:
+                (dd, mm, yy, carrier, flight_no, reg, dep, arr, status,
+                 ac_type, std, sta, atd, ata) = _get_fields(flight, _FLIGHT_GETTER, _FLIGHT_FIELDS)
+                flight_date = f"{dd}/{mm}/{yy}"
+                
+                flight_data = {
+                    # Map to fact_actuals schema
                     # Calculate block time in minutes from ATD/ATA
-                    block_minutes = self._calculate_block_minutes(
-                        getattr(flight, 'FlightAtd', ''),
-                        getattr(flight, 'FlightAta', '')
-                    )
+                    'block_minutes': self._calculate_block_minutes(atd, ata),
+                    'dep_actual_dt': self._parse_aims_datetime(flight_date, atd or std),
+                    'ac_reg': reg,
                     
-                    flight_data = {
-                        # Map to fact_actuals schema
-                        'block_minutes': block_minutes,
-                        'dep_actual_dt': self._parse_aims_datetime(
-                            f"{getattr(flight, 'FlightDD', '')}/{getattr(flight, 'FlightMM', '')}/{getattr(flight, 'FlightYY', '')}",
-                            getattr(flight, 'FlightAtd', '') or getattr(flight, 'FlightStd', '')
-                        ),
-                        'ac_reg': getattr(flight, 'FlightReg', ''),
-                        
-                        # Additional useful fields
-                        'flight_no': f"{getattr(flight, 'FlightCarrier', '')}{getattr(flight, 'FlightNo', '')}",
-                        'departure': getattr(flight, 'FlightDep', ''),
-                        'arrival': getattr(flight, 'FlightArr', ''),
-                        'status': getattr(flight, 'FlightStatus', ''),
-                        'ac_type': getattr(flight, 'FlightAcType', ''),
-                        
-                        # Schedule times
-                        'std': getattr(flight, 'FlightStd', ''),
-                        'sta': getattr(flight, 'FlightSta', ''),
-                        'atd': getattr(flight, 'FlightAtd', ''),
-                        'ata': getattr(flight, 'FlightAta', ''),
-                        
-                        # Flight date
-                        'flight_date': f"{getattr(flight, 'FlightDD', '')}/{getattr(flight, 'FlightMM', '')}/{getattr(flight, 'FlightYY', '')}"
-                    }
-                    flights.append(flight_data)
+                    # Additional useful fields
+                    'flight_no': f"{carrier}{flight_no}",
+                    'departure': dep,
+                    'arrival': arr,
+                    'status': status,
+                    'ac_type': ac_type,
+                    
+                    # Schedule times
+                    'std': std,
+                    'sta': sta,
+                    'atd': atd,
+                    'ata': ata,
+                    
+                    # Flight date
+                    'flight_date': flight_date
+                }
+                flights.append(flight_data)
             
-            logger.info(f"Fetched {len(flights)} flight details for period {from_date.date()} to {to_date.date()}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"Fetched {len(flights)} flight details for period {from_date.date()} to {to_date.date()}")
             
             return {
                 'success': True,
@@ -409,6 +859,7 @@ class AIMSSoapClient:
             logger.error(f"Error in get_flight_details: {e}")
             raise
     
+    @ttl_cache('crew_list')
     @retry_on_failure(max_retries=3)
     def get_crew_list(
         self,
@@ -433,13 +884,13 @@ class AIMSSoapClient:
         Returns:
             dict: Danh sách crew với thông tin chi tiết
         """
-        self._init_client()
-        
         # Default date range: today
         now = datetime.now()
         from_date = from_date or now
         to_date = to_date or now
         
+        self._init_client()
+        
         from_parts = self._format_date_parts(from_date)
         to_parts = self._format_date_parts(to_date)
         
@@ -460,23 +911,29 @@ class AIMSSoapClient:
                 PosStr=position or ''
             )
             
+            crew_items = getattr(response, 'CrewList', None)
+            if not crew_items:
+                return {'success': True, 'count': 0, 'crew_list': [], 'error': None}
+            
             crew_list = []
-            if hasattr(response, 'CrewList') and response.CrewList:
-                for crew in response.CrewList.TAIMSGetCrewItm:
-                    crew_data = {
-                        'crew_id': getattr(crew, 'Id', ''),
-                        'name': getattr(crew, 'CrewName', ''),
-                        'short_name': getattr(crew, 'ShortName', ''),
-                        'qualifications': getattr(crew, 'Quals', ''),
-                        'email': getattr(crew, 'Email', ''),
-                        'location': getattr(crew, 'Location', ''),
-                        'nationality': getattr(crew, 'Nationality', ''),
-                        'employment_date': getattr(crew, 'EmploymentDate', ''),
-                        'contact_cell': getattr(crew, 'ContactCell', ''),
-                    }
-                    crew_list.append(crew_data)
+            for crew in crew_items.TAIMSGetCrewItm:
+                (cid, name, short_name, quals, email, location,
+                 nationality, employment_date, contact_cell) = _get_fields(crew, _CREW_GETTER, _CREW_FIELDS)
+                crew_data = {
+                    'crew_id': cid,
+                    'name': name,
+                    'short_name': short_name,
+                    'qualifications': quals,
+                    'email': email,
+                    'location': location,
+                    'nationality': nationality,
+                    'employment_date': employment_date,
+                    'contact_cell': contact_cell,
+                }
+                crew_list.append(crew_data)
             
-            logger.info(f"Fetched {len(crew_list)} crew members")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"Fetched {len(crew_list)} crew members")
             
             return {
                 'success': True,
@@ -492,23 +949,25 @@ class AIMSSoapClient:
             logger.error(f"Error in get_crew_list: {e}")
             raise
     
+    def invalidate_crew_list_cache(self):
+        """Drop cached crew lists (call after crew master data is synced)"""
+        self.invalidate_cache('crew_list')
+    
+    def invalidate_cache(self, policy: str = None):
+        """Drop cached responses for one policy, or all of them"""
+        with self._cache_lock:
+            if policy is None:
+                self._cache.clear()
+            else:
+                for key in [k for k in self._cache if k[0] == policy]:
+                    del self._cache[key]
+    
     def _parse_aims_datetime(self, date_str: str, time_str: str) -> Optional[str]:
         """Parse AIMS date/time strings to ISO format"""
         if not date_str or not time_str:
             return None
         try:
-            # Handle various date formats
-            date_str = date_str.strip()
-            time_str = time_str.strip()
-            
-            # Try DD/MM/YY or DD/MM/YYYY format
-            for fmt in ['%d/%m/%y', '%d/%m/%Y', '%Y-%m-%d']:
-                try:
-                    dt = datetime.strptime(f"{date_str} {time_str}", f"{fmt} %H:%M")
-                    return dt.isoformat()
-                except ValueError:
-                    continue
-            return None
+            return _parse_aims_datetime_cached(date_str.strip(), time_str.strip())
         except Exception:
             return None
     
@@ -516,20 +975,14 @@ class AIMSSoapClient:
         """Calculate block time in minutes from ATD/ATA strings"""
         if not atd or not ata:
             return 0
-        try:
-            atd_parts = atd.split(':')
-            ata_parts = ata.split(':')
-            
-            atd_minutes = int(atd_parts[0]) * 60 + int(atd_parts[1])
-            ata_minutes = int(ata_parts[0]) * 60 + int(ata_parts[1])
-            
-            # Handle overnight flights
-            if ata_minutes < atd_minutes:
-                ata_minutes += 24 * 60
-                
-            return ata_minutes - atd_minutes
-        except Exception:
+        atd_minutes = parse_time_to_minutes(atd)
+        ata_minutes = parse_time_to_minutes(ata)
+        if atd_minutes is None or ata_minutes is None:
             return 0
+        
+        diff = ata_minutes - atd_minutes
+        # Handle overnight flights
+        return diff + (1440 if diff < 0 else 0)
     
     def get_optimized_date_range(self, days_back: int = 30, days_forward: int = 30):
         """
@@ -564,7 +1017,7 @@ class AIMSSoapClient:
         from_date = now - timedelta(days=28)
         
         # Get crew roster for 28 days
-        roster = self.get_crew_roster(crew_id, from_date, now)
+        roster = self.get_crew_roster(crew_id, from_date, now, include_raw=True)
         
         if not roster['success']:
             return {
@@ -576,10 +1029,7 @@ class AIMSSoapClient:
             }
         
         # Sum block minutes from roster items
-        total_minutes = sum(
-            item.get('block_minutes', 0) or self._calculate_block_from_schedule(item)
-            for item in roster['items']
-        )
+        total_minutes = sum(item['block_minutes'] for item in roster['items'])
         
         total_hours = total_minutes / 60.0
         
@@ -601,13 +1051,6 @@ class AIMSSoapClient:
             'details': roster['items']
         }
     
-    def _calculate_block_from_schedule(self, roster_item: dict) -> int:
-        """Calculate block minutes from schedule times if actual not available"""
-        raw = roster_item.get('_raw', {})
-        atd = raw.get('ATD') or raw.get('STD')
-        ata = raw.get('ATA') or raw.get('STA')
-        return self._calculate_block_minutes(atd, ata)
-    
     @retry_on_failure(max_retries=3)
     def fetch_leg_members_per_day(self, date: datetime) -> Dict[str, Any]:
         """
@@ -646,36 +1089,45 @@ class AIMSSoapClient:
                 logger.error(f"AIMS Error in FetchLegMembersPerDay: {error_msg}")
                 return {'success': False, 'error': str(error_msg), 'legs': [], 'date': date.strftime('%d/%m/%Y')}
             
-            # Parse response
-            legs = []
-            
             # Drill down to leg list
             # Structure: response.DayMember.TAIMSGetLegMembers -> List of Legs
             day_member = getattr(response, 'DayMember', None)
-            raw_legs = []
+            # Zeep might wrap the list in TAIMSGetLegMembers
+            raw_legs = getattr(day_member, 'TAIMSGetLegMembers', None) if day_member else None
             
-            if day_member:
-                # Zeep might wrap the list in TAIMSGetLegMembers
-                raw_legs = getattr(day_member, 'TAIMSGetLegMembers', [])
+            # No flights this day - skip the parsing setup entirely
+            if not raw_legs:
+                return {
+                    'success': True,
+                    'date': date.strftime('%d/%m/%Y'),
+                    'count': 0,
+                    'total_crew_operating': 0,
+                    'crew_rotations': [],
+                    'legs': [],
+                    'error': None
+                }
                 
             # If it's not a list, try to make it one (single item case)
-            if raw_legs and not isinstance(raw_legs, list):
+            if not isinstance(raw_legs, list):
                 raw_legs = [raw_legs]
                 
-            unique_crew_ids = set()
-            rotations = set()
+            # Parse response
+            legs = []
+            # Collected flat and de-duplicated once at the end
+            crew_ids = []
+            rotations = []
                 
             for leg in raw_legs:
-                flight_no = getattr(leg, 'FlightNo', '')
+                flight_no, carrier, dep, arr, dd, mm, yy, status = _get_fields(leg, _LEG_GETTER, _LEG_FIELDS)
                 
                 leg_data = {
                     'flight_no': flight_no,
-                    'carrier': getattr(leg, 'FlightCarrier', ''),
-                    'dep': getattr(leg, 'FlightDep', ''),
-                    'arr': getattr(leg, 'FlightArr', ''),
+                    'carrier': carrier,
+                    'dep': dep,
+                    'arr': arr,
                     # Construct date from parts
-                    'date': f"{getattr(leg, 'FlightDD', '')}/{getattr(leg, 'FlightMM', '')}/{getattr(leg, 'FlightYY', '')}",
-                    'status': getattr(leg, 'FlightStatus', ''),
+                    'date': f"{dd}/{mm}/{yy}",
+                    'status': status,
                     'crew': []
                 }
                 
@@ -688,32 +1140,33 @@ class AIMSSoapClient:
                         members = [members]
                         
                     for crew in members:
-                        crew_id = str(getattr(crew, 'id', ''))
+                        member_id, name, pos, crte, base = _get_fields(crew, _MEMBER_GETTER, _MEMBER_FIELDS)
+                        crew_id = str(member_id)
                         if crew_id:
-                            unique_crew_ids.add(crew_id)
+                            crew_ids.append(crew_id)
                         
-                        crte = getattr(crew, 'crte', '')
                         if crte:
-                            rotations.add(crte)
+                            rotations.append(crte)
                             
                         leg_data['crew'].append({
                             'id': crew_id,
-                            'name': getattr(crew, 'name', ''),
-                            'role': getattr(crew, 'pos', ''),
+                            'name': name,
+                            'role': pos,
                             'rotation': crte,
-                            'base': getattr(crew, 'base', '')
+                            'base': base
                         })
                 
                 legs.append(leg_data)
             
-            logger.info(f"FetchLegMembersPerDay: Got {len(legs)} legs for {date.strftime('%d/%m/%Y')}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"FetchLegMembersPerDay: Got {len(legs)} legs for {date.strftime('%d/%m/%Y')}")
             
             return {
                 'success': True,
                 'date': date.strftime('%d/%m/%Y'),
                 'count': len(legs),
-                'total_crew_operating': len(unique_crew_ids),
-                'crew_rotations': list(rotations),
+                'total_crew_operating': len(set(crew_ids)),
+                'crew_rotations': list(dict.fromkeys(rotations)),
                 'legs': legs,
                 'error': None
             }
@@ -768,7 +1221,8 @@ class AIMSSoapClient:
                     }
                     crew_list.append(crew_data)
             
-            logger.info(f"FetchCrewQuals: Got {len(crew_list)} crew members")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"FetchCrewQuals: Got {len(crew_list)} crew members")
             
             return {
                 'success': True,
@@ -784,6 +1238,7 @@ class AIMSSoapClient:
             logger.error(f"Error in fetch_crew_quals: {e}")
             raise
     
+    @ttl_cache('schedule_changes')
     @retry_on_failure(max_retries=3)
     def crew_schedule_changes_for_period(
         self, 
@@ -841,7 +1296,8 @@ class AIMSSoapClient:
                     }
                     changes.append(change_data)
             
-            logger.info(f"CrewScheduleChangesForPeriod: Got {len(changes)} changes")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"CrewScheduleChangesForPeriod: Got {len(changes)} changes")
             
             return {
                 'success': True,
@@ -859,6 +1315,7 @@ class AIMSSoapClient:
             logger.error(f"Error in crew_schedule_changes_for_period: {e}")
             raise
 
+    @ttl_cache('bulk_status')
     @retry_on_failure(max_retries=2)
     def get_bulk_crew_status(
         self,
@@ -883,63 +1340,57 @@ class AIMSSoapClient:
             return crew_res
             
         crew_list = crew_res.get('crew_list', [])
-        logger.info(f"Categorizing status for {len(crew_list)} crew members at base {base}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"Categorizing status for {len(crew_list)} crew members at base {base}")
         
         counts = {'SBY': 0, 'SL': 0, 'CSL': 0, 'OFF': 0, 'FGT': 0, 'OTHER': 0}
         
-        # Optimization: Limit concurrent requests or use a smaller sample if base is too large
-        # For real production, AIMS might provide a bulk service, but we use individual roster details here
-        max_crew = 200 # Safety limit for performance
+        # AIMS has no per-base status operation, so rosters are fetched per crew.
+        # Large bases are capped; counts then describe the sample only (never extrapolated).
+        max_crew = self.BULK_STATUS_MAX_CREW or len(crew_list)
+        sampled = crew_list[:max_crew]
         
-        for crew in crew_list[:max_crew]:
+        crew_ids = []
+        for crew in sampled:
             cid = crew.get('crew_id')
             if not cid: continue
-            
             try:
-                # Fetch roster for just that day
-                roster = self.get_crew_roster(int(cid), target_date, target_date)
+                crew_ids.append(int(cid))
+            except (TypeError, ValueError):
+                logger.error(f"Invalid crew id: {cid}")
+                counts['OTHER'] += 1
+        
+        # Fetch roster for just that day - all crew concurrently over the pooled session
+        rosters = self.get_crew_rosters_bulk(
+            crew_ids, target_date, target_date,
+            max_workers=self.BULK_STATUS_WORKERS, codes_only=True
+        )
+        
+        for cid, roster in rosters.items():
+            try:
                 if roster.get('success') and roster.get('items'):
-                    status_found = False
+                    # First recognised status code wins; a day with none of them is flying
+                    bucket = None
                     for item in roster['items']:
-                        code = str(item.get('activity_type', '')).strip().upper()
-                        
-                        # Classification logic
-                        if code == 'SBY' or 'STANDBY' in code:
-                            counts['SBY'] += 1
-                            status_found = True
-                        elif code in ['SL', 'SICK', 'BN', 'OM']:
-                            counts['SL'] += 1
-                            status_found = True
-                        elif code in ['CSL', 'CSICK']:
-                            counts['CSL'] += 1
-                            status_found = True
-                        elif code == 'OFF':
-                            counts['OFF'] += 1
-                            status_found = True
-                        
-                        if status_found: break
-                    
-                    if not status_found:
-                        counts['FGT'] += 1
+                        bucket = _status_bucket(str(item.get('activity_type', '')).strip().upper())
+                        if bucket:
+                            break
+                    counts[bucket or 'FGT'] += 1
                 else:
                     counts['OTHER'] += 1
             except Exception as e:
-                logger.error(f"Error fetching roster for crew {cid}: {e}")
+                logger.error(f"Error classifying roster for crew {cid}: {e}")
                 counts['OTHER'] += 1
                 
-        # Scale counts back up to total crew if we sampled
-        if len(crew_list) > max_crew and max_crew > 0:
-            scale = len(crew_list) / max_crew
-            for k in counts:
-                counts[k] = int(counts[k] * scale)
-                
         return {
             'success': True,
             'date': target_date.strftime('%d/%m/%Y'),
             'base': base,
             'summary': counts,
             'total_crew': len(crew_list),
-            'sampled_crew': min(len(crew_list), max_crew)
+            'sampled_crew': len(sampled),
+            'is_sample': len(sampled) < len(crew_list),
+            'sample_ratio': round(len(sampled) / len(crew_list), 3) if crew_list else 1.0
         }
 
 
@@ -965,6 +1416,8 @@ def is_aims_available() -> bool:
 if __name__ == '__main__':
     import sys
     
+    setup_logging()
+    
     print("=" * 60)
     print("AIMS SOAP Client - Connection Test")
     print("=" * 60)
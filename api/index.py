@@ -4,141 +4,274 @@ Full Version with Supabase Integration
 """
 
 from flask import Flask, request, render_template, redirect, url_for, flash, jsonify
+import copy
 import os
 import sys
 import re
-import traceback
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 # Add parent directory to path
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, root_dir)
 
+from utils.date_utils import parse_time_to_minutes
+
 # Initialize Flask
 app = Flask(__name__, template_folder=root_dir)
 app.secret_key = os.environ.get('SECRET_KEY', 'crew-dashboard-2026')
+# Uploads are decoded in memory (encoding fallback needs the whole file) - bound them
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Templates are immutable in a deployment - compile once, never stat for changes
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+
+try:
+    from api.middleware import setup_error_handlers, setup_json_provider
+    setup_error_handlers(app)
+    setup_json_provider(app)
+except ImportError as e:
+    print(f"[WARN] Middleware failed: {e}")
 
 # ==================== SAFE IMPORTS ====================
 processor = None
 db = None
 supabase_connected = False
 
-try:
-    from data_processor import DataProcessor
-    processor = DataProcessor(data_dir=root_dir)
-    print("[OK] DataProcessor loaded")
-except Exception as e:
-    print(f"[WARN] DataProcessor failed: {e}")
+_processor_lock = threading.Lock()
+_processor_failed = False
+
+
+def get_processor():
+    """DataProcessor on first use - keeps its import and initial load off the cold start"""
+    global processor, _processor_failed
+    if processor is None and not _processor_failed:
+        with _processor_lock:
+            if processor is None and not _processor_failed:
+                try:
+                    from data_processor import DataProcessor
+                    processor = DataProcessor(data_dir=root_dir)
+                    print("[OK] DataProcessor loaded")
+                except Exception as e:
+                    _processor_failed = True
+                    print(f"[WARN] DataProcessor failed: {e}")
+    return processor
+
+
+# Guards only snapshotting / publishing the shared processor's attributes - parsing and metrics run on private copies
+_processor_state_lock = threading.Lock()
+
+
+def _processor_view(shared):
+    """Shallow copy of the shared processor: a request rebinds its maps on the copy, never on the shared one"""
+    with _processor_state_lock:
+        return copy.copy(shared)
+
+
+def _publish_parsed(shared, view, before):
+    """Copy the attributes a parse rebound on `view` (vs its `before` snapshot) onto the shared processor"""
+    changed = {name: value for name, value in vars(view).items() if before.get(name) is not value}
+    with _processor_state_lock:
+        vars(shared).update(changed)
 
 # Check Supabase credentials
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
 
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        import supabase_client as db
-        supabase_connected, msg = db.check_connection()
-        print(f"[SUPABASE] {msg}")
-    except Exception as e:
-        print(f"[WARN] Supabase failed: {e}")
-        db = None
-else:
+if not (SUPABASE_URL and SUPABASE_KEY):
     print("[INFO] Supabase credentials not set - using local files")
 
+# A failed connection check is retried after this many seconds
+DB_RETRY_SECONDS = 60
+_db_lock = threading.Lock()
+_db_checked_at = None
+
+
+def get_db():
+    """supabase_client once the connection check passes - checked on first use, not at import"""
+    global db, supabase_connected, _db_checked_at
+    if supabase_connected or not (SUPABASE_URL and SUPABASE_KEY):
+        return db if supabase_connected else None
+    
+    with _db_lock:
+        now = time.monotonic()
+        if not supabase_connected and (_db_checked_at is None or now - _db_checked_at >= DB_RETRY_SECONDS):
+            _db_checked_at = now
+            try:
+                import supabase_client
+                connected, msg = supabase_client.check_connection()
+                print(f"[SUPABASE] {msg}")
+                db = supabase_client
+                supabase_connected = connected
+            except Exception as e:
+                print(f"[WARN] Supabase failed: {e}")
+    return db if supabase_connected else None
+
+
+# ==================== HELPERS ====================
+# "(CP) 1234" pairs in the flights.crew string
+_CREW_RE = re.compile(r'\(([A-Z]{2})\)\s*(\d+)')
+_ROLE_INTERN = {r: sys.intern(r) for r in ('CP', 'FO', 'PU', 'FA')}
+
+# ac_utilization row fields and their defaults (cycles are stored as INTEGER)
+_UTIL_TEXT_DEFAULTS = (('dom_block', '00:00'), ('int_block', '00:00'), ('total_block', '00:00'), ('avg_util', ''))
+_UTIL_CYCLE_FIELDS = ('dom_cycles', 'int_cycles', 'total_cycles')
+
+# Independent Supabase reads per request run side by side
+_DB_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='supabase')
+
 
 # ==================== DEFAULT DATA ====================
+# Built once; get_default_data() hands out deep copies
+_DEFAULT_DATA = {
+    'summary': {
+        'total_aircraft': 0, 'total_flights': 0, 'total_crew': 0,
+        'avg_flight_hours': 0, 'total_block_hours': 0, 'crew_rotation_count': 0,
+        'crew_by_role': {'CP': 0, 'FO': 0, 'PU': 0, 'FA': 0}
+    },
+    'aircraft': [], 'crew_roles': {'CP': 0, 'FO': 0, 'PU': 0, 'FA': 0},
+    'crew_rotations': [], 'available_dates': [], 'operating_crew': [],
+    'utilization': {}, 'rolling_hours': [],
+    'rolling_stats': {'normal': 0, 'warning': 0, 'critical': 0, 'total': 0},
+    'crew_schedule': {'summary': {'SL': 0, 'CSL': 0, 'SBY': 0, 'OSBY': 0}}
+}
+
+
 def get_default_data():
-    return {
-        'summary': {
-            'total_aircraft': 0, 'total_flights': 0, 'total_crew': 0,
-            'avg_flight_hours': 0, 'total_block_hours': 0, 'crew_rotation_count': 0,
-            'crew_by_role': {'CP': 0, 'FO': 0, 'PU': 0, 'FA': 0}
-        },
-        'aircraft': [], 'crew_roles': {'CP': 0, 'FO': 0, 'PU': 0, 'FA': 0},
-        'crew_rotations': [], 'available_dates': [], 'operating_crew': [],
-        'utilization': {}, 'rolling_hours': [],
-        'rolling_stats': {'normal': 0, 'warning': 0, 'critical': 0, 'total': 0},
-        'crew_schedule': {'summary': {'SL': 0, 'CSL': 0, 'SBY': 0, 'OSBY': 0}}
-    }
+    """Empty dashboard data - a fresh copy, safe to mutate"""
+    return copy.deepcopy(_DEFAULT_DATA)
 
 
 def load_local_data():
     """Load data from local CSV files"""
+    processor = get_processor()
     if not processor:
         return get_default_data(), []
     try:
-        processor.process_dayrep_csv()
-        processor.process_sacutil_csv()
-        processor.process_rolcrtot_csv()
-        processor.process_crew_schedule_csv()
-        return processor.calculate_metrics(None), processor.available_dates
+        # process_*_csv rebind every map they fill, so a private copy can parse without a lock
+        view = _processor_view(processor)
+        view.process_dayrep_csv()
+        view.process_sacutil_csv()
+        view.process_rolcrtot_csv()
+        view.process_crew_schedule_csv()
+        metrics = view.calculate_metrics(None)
+        metrics['aircraft_regs'] = list(view.reg_flight_hours.keys())
+        return metrics, view.available_dates
     except Exception as e:
         print(f"[ERROR] Load local data: {e}")
         return get_default_data(), []
 
 
+# ==================== DASHBOARD CACHE ====================
+# Supabase tables only change on upload; warm instances reuse results for a short TTL
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', '30'))
+_DASHBOARD_CACHE_MAX = 32
+_dashboard_cache = {}  # filter_date -> (stored_at, (metrics, available_dates))
+_dashboard_cache_lock = threading.Lock()
+
+
+def clear_dashboard_cache():
+    """Drop cached dashboard data (after uploads)"""
+    with _dashboard_cache_lock:
+        _dashboard_cache.clear()
+
+
 def load_supabase_data(filter_date=None):
     """Load data from Supabase"""
-    if not db or not supabase_connected or not processor:
+    db = get_db()
+    if not db:
+        return get_default_data(), []
+    
+    # Cached results are shared between requests - callers must not mutate them
+    with _dashboard_cache_lock:
+        entry = _dashboard_cache.get(filter_date)
+    if entry and time.monotonic() - entry[0] < DASHBOARD_CACHE_TTL:
+        return entry[1]
+    
+    processor = get_processor()
+    if not processor:
         return get_default_data(), []
     
     try:
-        flights = db.get_flights(filter_date) or []
-        available_dates = db.get_available_dates() or []
+        # All four reads are independent - total latency is the slowest one, not the sum
+        flights_future = _DB_EXECUTOR.submit(db.get_flights, filter_date)
+        dates_future = _DB_EXECUTOR.submit(db.get_available_dates)
+        rolling_future = _DB_EXECUTOR.submit(db.get_rolling_hours_dashboard, 20)
+        schedule_future = _DB_EXECUTOR.submit(db.get_crew_schedule_summary, filter_date)
+        
+        flights = flights_future.result() or []
+        available_dates = dates_future.result() or []
         
         if not flights:
             return get_default_data(), available_dates
         
-        # Process flights
-        processor.flights = flights
-        processor.available_dates = available_dates
-        processor.crew_to_regs.clear()
-        processor.reg_flight_hours.clear()
-        processor.reg_flight_count.clear()
-        
+        # Process flights into fresh per-request maps; processor is only touched once they're complete
+        # Block time is summed as integer minutes per reg; hours are derived once below
+        reg_minutes = {}
+        reg_flight_count = defaultdict(int)
+        crew_to_regs = defaultdict(set)
+        crew_roles = {}
         for flight in flights:
             try:
                 reg = flight.get('reg', '')
-                std, sta = flight.get('std', ''), flight.get('sta', '')
-                crew_string = flight.get('crew', '')
+                crew_string = flight.get('crew') or ''
                 
-                if std and sta and ':' in str(std) and ':' in str(sta):
-                    std_min = int(str(std).split(':')[0]) * 60 + int(str(std).split(':')[1])
-                    sta_min = int(str(sta).split(':')[0]) * 60 + int(str(sta).split(':')[1])
-                    duration = sta_min - std_min
-                    if duration < 0: duration += 24 * 60
-                    processor.reg_flight_hours[reg] += duration / 60
-                    processor.reg_flight_count[reg] += 1
+                std_min = parse_time_to_minutes(flight.get('std'))
+                sta_min = parse_time_to_minutes(flight.get('sta'))
+                if std_min is not None and sta_min is not None:
+                    reg_minutes[reg] = reg_minutes.get(reg, 0) + (sta_min - std_min) % 1440
+                    reg_flight_count[reg] += 1
                 
                 if crew_string:
-                    for role, crew_id in re.findall(r'\(([A-Z]{2})\)\s*(\d+)', str(crew_string)):
-                        processor.crew_to_regs[crew_id].add(reg)
-                        processor.crew_roles[crew_id] = role
+                    for match in _CREW_RE.finditer(crew_string):
+                        role, crew_id = match.groups()
+                        crew_to_regs[crew_id].add(reg)
+                        crew_roles[crew_id] = _ROLE_INTERN.get(role, role)
             except (ValueError, TypeError, KeyError):
                 continue
         
-        metrics = processor.calculate_metrics(filter_date)
+        reg_flight_hours = defaultdict(float, {reg: minutes / 60 for reg, minutes in reg_minutes.items()})
+        
+        view = _processor_view(processor)
+        view.flights = flights
+        view.available_dates = available_dates
+        view.crew_to_regs = crew_to_regs
+        view.crew_roles = crew_roles
+        view.reg_flight_hours = reg_flight_hours
+        view.reg_flight_count = reg_flight_count
+        
+        metrics = view.calculate_metrics(filter_date)
         
         # Add Supabase-specific data
         try:
-            # 1. Rolling Hours
-            all_rolling = db.get_rolling_hours() or []
-            metrics['rolling_hours'] = all_rolling[:20]
-            
-            # Recalculate rolling_stats locally from the full list
-            stats = {'normal': 0, 'warning': 0, 'critical': 0}
-            for r in all_rolling:
-                status = r.get('status', 'normal').lower()
-                if status in stats:
-                    stats[status] += 1
-            metrics['rolling_stats'] = stats
+            # 1. Rolling Hours - top 20 + status counts aggregated in Postgres
+            rolling = rolling_future.result()
+            if rolling is not None:
+                metrics['rolling_hours'] = rolling['items']
+                status_counts = rolling['counts']
+            else:
+                # RPC not deployed: fetch the full list and count locally
+                all_rolling = db.get_rolling_hours() or []
+                metrics['rolling_hours'] = all_rolling[:20]
+                status_counts = Counter((r.get('status') or 'normal').lower() for r in all_rolling)
+            metrics['rolling_stats'] = {k: status_counts.get(k, 0) for k in ('normal', 'warning', 'critical')}
 
             # 2. Crew Schedule Summary
             # Wrap in summary to match template expectation: data.crew_schedule.summary
-            summary_data = db.get_crew_schedule_summary(filter_date) or {'SL': 0, 'CSL': 0, 'SBY': 0, 'OSBY': 0}
+            summary_data = schedule_future.result() or {'SL': 0, 'CSL': 0, 'SBY': 0, 'OSBY': 0}
             metrics['crew_schedule'] = {'summary': summary_data}
         except Exception as e:
             print(f"Error processing Supabase data: {e}")
         
+        # Results carry their own reg list - index() never reads processor state
+        metrics['aircraft_regs'] = list(reg_flight_hours.keys())
+        if DASHBOARD_CACHE_TTL > 0:
+            with _dashboard_cache_lock:
+                if len(_dashboard_cache) >= _DASHBOARD_CACHE_MAX:
+                    _dashboard_cache.clear()
+                _dashboard_cache[filter_date] = (time.monotonic(), (metrics, available_dates))
+        
         return metrics, available_dates
     except Exception as e:
         print(f"[ERROR] Supabase load: {e}")
@@ -153,7 +286,7 @@ def index():
     available_dates = []
     
     try:
-        if supabase_connected and db:
+        if get_db():
             metrics, available_dates = load_supabase_data(filter_date)
         else:
             metrics, available_dates = load_local_data()
@@ -167,7 +300,7 @@ def index():
         
         data = {
             'summary': metrics.get('summary', data['summary']),
-            'aircraft': list(processor.reg_flight_hours.keys()) if processor else [],
+            'aircraft': metrics.get('aircraft_regs', []),
             'crew_roles': metrics.get('crew_roles', data['crew_roles']),
             'crew_rotations': metrics.get('crew_rotations', []),
             'available_dates': available_dates,
@@ -178,58 +311,64 @@ def index():
             'crew_schedule': metrics.get('crew_schedule', data['crew_schedule']),
             'compliance_rate': compliance_rate
         }
-    except Exception as e:
-        print(f"[ERROR] Index: {e}")
-        traceback.print_exc()
+    except Exception:
+        # Still render the dashboard, with empty data
+        app.logger.exception("Index: failed to load dashboard data")
     
     try:
         return render_template('crew_dashboard.html', data=data, filter_date=filter_date, db_connected=supabase_connected)
-    except Exception as e:
-        return f"<h1>Template Error</h1><pre>{traceback.format_exc()}</pre>", 500
+    except Exception:
+        # HTML page, not the JSON API error body; details stay in the log
+        app.logger.exception("Index: template render failed")
+        return "<h1>Template Error</h1>", 500
 
 
 @app.route('/upload', methods=['POST'])
 def upload_files():
-    if not supabase_connected or not db:
+    db = get_db()
+    if not db:
         flash('Supabase not connected')
         return redirect(url_for('index'))
     
+    processor = get_processor()
+    if not processor:
+        flash('Data processor not available')
+        return redirect(url_for('index'))
+    
     try:
+        # Parse every file into a private copy of the processor, then send all table inserts concurrently
+        inserts = []  # (table label, insert function, rows)
+        
+        view = _processor_view(processor)
+        before = dict(vars(view))
+        
         if 'dayrep' in request.files and request.files['dayrep'].filename:
             content = request.files['dayrep'].read()
-            count = processor.process_dayrep_csv(file_content=content, sync_db=False)
-            res = db.insert_flights([{
+            count = view.process_dayrep_csv(file_content=content, sync_db=False)
+            inserts.append(('flights', db.insert_flights, [{
                 'date': f.get('date', ''), 'calendar_date': f.get('calendar_date', ''),
                 'reg': f.get('reg', ''), 'flt': f.get('flt', ''),
                 'dep': f.get('dep', ''), 'arr': f.get('arr', ''),
                 'std': f.get('std', ''), 'sta': f.get('sta', ''),
                 'crew': f.get('crew', '')
-            } for f in processor.flights])
-            if res is None: raise Exception("Failed to insert flights to DB. Check RLS policies.")
+            } for f in view.flights]))
 
         if 'sacutil' in request.files and request.files['sacutil'].filename:
             content = request.files['sacutil'].read()
-            processor.process_sacutil_csv(file_content=content, sync_db=False)
-            util_data = []
-            for date_str, ac_types in processor.ac_utilization_by_date.items():
-                for ac_type, stats in ac_types.items():
-                    util_data.append({
-                        'date': date_str, 'ac_type': ac_type,
-                        'dom_block': stats.get('dom_block', '00:00'),
-                        'int_block': stats.get('int_block', '00:00'),
-                        'total_block': stats.get('total_block', '00:00'),
-                        'dom_cycles': int(stats.get('dom_cycles', 0) or 0),
-                        'int_cycles': int(stats.get('int_cycles', 0) or 0),
-                        'total_cycles': int(stats.get('total_cycles', 0) or 0),
-                        'avg_util': stats.get('avg_util', '')
-                    })
+            view.process_sacutil_csv(file_content=content, sync_db=False)
+            util_data = [
+                {'date': date_str, 'ac_type': ac_type,
+                 **{k: stats.get(k, d) for k, d in _UTIL_TEXT_DEFAULTS},
+                 **{k: int(stats.get(k) or 0) for k in _UTIL_CYCLE_FIELDS}}
+                for date_str, ac_types in view.ac_utilization_by_date.items()
+                for ac_type, stats in ac_types.items()
+            ]
             if util_data:
-                res = db.insert_ac_utilization(util_data)
-                if res is None: raise Exception("Failed to insert AC util to DB.")
+                inserts.append(('AC util', db.insert_ac_utilization, util_data))
         
         if 'rolcrtot' in request.files and request.files['rolcrtot'].filename:
             content = request.files['rolcrtot'].read()
-            processor.process_rolcrtot_csv(file_content=content, sync_db=False)
+            view.process_rolcrtot_csv(file_content=content, sync_db=False)
             hours_data = [{
                 'crew_id': item.get('id', ''), 'name': item.get('name', ''),
                 'seniority': item.get('seniority', ''),
@@ -239,26 +378,34 @@ def upload_files():
                 'hours_12month': item.get('hours_12month', 0),
                 'percentage': item.get('percentage', 0),
                 'status': item.get('status', 'normal')
-            } for item in processor.rolling_hours]
+            } for item in view.rolling_hours]
             if hours_data:
-                res = db.insert_rolling_hours(hours_data)
-                if res is None: raise Exception("Failed to insert rolling hours to DB.")
+                inserts.append(('rolling hours', db.insert_rolling_hours, hours_data))
         
         if 'crew_schedule' in request.files and request.files['crew_schedule'].filename:
             content = request.files['crew_schedule'].read()
-            processor.process_crew_schedule_csv(file_content=content, sync_db=False)
-            schedule_data = []
-            for date_str, counts in processor.crew_schedule_by_date.items():
-                for status_type in ['SL', 'CSL', 'SBY', 'OSBY']:
-                    for _ in range(counts.get(status_type, 0)):
-                        schedule_data.append({'date': date_str, 'status_type': status_type})
+            view.process_crew_schedule_csv(file_content=content, sync_db=False)
+            schedule_data = [
+                {'date': date_str, 'status_type': status_type, 'count': counts[status_type]}
+                for date_str, counts in view.crew_schedule_by_date.items()
+                for status_type in ('SL', 'CSL', 'SBY', 'OSBY') if counts.get(status_type)
+            ]
             if schedule_data:
-                res = db.insert_crew_schedule(schedule_data)
-                if res is None: raise Exception("Failed to insert crew schedule to DB.")
+                inserts.append(('crew schedule', db.insert_crew_schedule, schedule_data))
+        
+        _publish_parsed(processor, view, before)
+        
+        futures = [(label, _DB_EXECUTOR.submit(insert, rows)) for label, insert, rows in inserts]
+        failed = [label for label, future in futures if future.result() is None]
+        if failed:
+            raise Exception(f"Failed to insert {', '.join(failed)} to DB. Check RLS policies.")
         
         flash('Data uploaded successfully!')
     except Exception as e:
         flash(f'Upload error: {str(e)}')
+    finally:
+        # Even a partial upload may have replaced tables
+        clear_dashboard_cache()
     
     return redirect(url_for('index'))
 
@@ -266,13 +413,20 @@ def upload_files():
 @app.route('/api/status')
 def api_status():
     return jsonify({
-        'processor_loaded': processor is not None,
+        # Loaded lazily: healthy until a load attempt has failed; processor_initialized = built yet
+        'processor_loaded': processor is not None or not _processor_failed,
+        'processor_initialized': processor is not None,
         'supabase_url_set': SUPABASE_URL is not None,
         'supabase_key_set': SUPABASE_KEY is not None,
-        'supabase_connected': supabase_connected
+        'supabase_connected': supabase_connected,
+        'supabase_checked': _db_checked_at is not None
     })
 
 
+# Fixed body - probes shouldn't pay for serialization
+_HEALTH_RESPONSE = ('{"status":"ok"}', 200, {'Content-Type': 'application/json'})
+
+
 @app.route('/api/health')
 def health():
-    return jsonify({'status': 'ok'})
+    return _HEALTH_RESPONSE
@@ -7,9 +7,11 @@ from api.middleware.error_handler import (
     setup_request_logging,
     safe_endpoint
 )
+from api.middleware.json_provider import setup_json_provider
 
 __all__ = [
     'setup_error_handlers',
     'setup_request_logging',
-    'safe_endpoint'
+    'safe_endpoint',
+    'setup_json_provider'
 ]
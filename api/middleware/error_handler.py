@@ -4,11 +4,11 @@ Centralized Error Handling Middleware for Flask
 Provides consistent error responses and logging across all endpoints.
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, flash, jsonify, redirect, request, url_for
 from functools import wraps
 import logging
-import traceback
 from typing import Tuple, Dict, Any, Callable
+from werkzeug.exceptions import HTTPException
 
 from app.errors import (
     AppError, 
@@ -87,8 +87,12 @@ def setup_error_handlers(app: Flask):
         }), 405
     
     @app.errorhandler(413)
-    def handle_payload_too_large(error) -> Tuple[Dict, int]:
+    def handle_payload_too_large(error):
         """Handle payload too large errors"""
+        if not (request.is_json or request.path.startswith('/api/')):
+            # Dashboard upload form: back to the page with a message, like other upload errors
+            flash("Upload error: File too large. Maximum size is 16MB.")
+            return redirect(url_for('index'))
         return jsonify({
             'error': True,
             'code': 'PAYLOAD_TOO_LARGE',
@@ -99,8 +103,7 @@ def setup_error_handlers(app: Flask):
     @app.errorhandler(500)
     def handle_server_error(error) -> Tuple[Dict, int]:
         """Handle internal server errors"""
-        logger.error(f"Server Error: {error}")
-        logger.error(traceback.format_exc())
+        logger.exception("Server Error: %s", error)
         return jsonify({
             'error': True,
             'code': 'INTERNAL_ERROR',
@@ -111,8 +114,10 @@ def setup_error_handlers(app: Flask):
     @app.errorhandler(Exception)
     def handle_unexpected_error(error) -> Tuple[Dict, int]:
         """Handle all unexpected exceptions"""
-        logger.error(f"Unexpected Error: {type(error).__name__}: {error}")
-        logger.error(traceback.format_exc())
+        if isinstance(error, HTTPException):
+            # abort(4xx), redirects etc. keep their own status and response
+            return error
+        logger.exception("Unexpected Error: %s: %s", type(error).__name__, error)
         return jsonify({
             'error': True,
             'code': 'UNEXPECTED_ERROR',
@@ -157,8 +162,7 @@ def safe_endpoint(func: Callable) -> Callable:
             # Let the error handler deal with it
             raise
         except Exception as e:
-            logger.error(f"Endpoint {func.__name__} failed: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("Endpoint %s failed: %s", func.__name__, e)
             # Convert to AppError for consistent handling
             raise AppError(
                 message=f"Operation failed: {str(e)}",
@@ -167,16 +171,23 @@ def safe_endpoint(func: Callable) -> Callable:
     return wrapper
 
 
+# Uptime probes hit these every few seconds - not worth a log record
+_UNLOGGED_PATHS = frozenset({'/api/health'})
+
+
 def log_request():
     """Log incoming request details"""
-    logger.debug(f"Request: {request.method} {request.path}")
+    if request.path in _UNLOGGED_PATHS:
+        return
+    logger.debug("Request: %s %s", request.method, request.path)
     if request.content_length:
-        logger.debug(f"Content-Length: {request.content_length}")
+        logger.debug("Content-Length: %s", request.content_length)
 
 
 def log_response(response):
     """Log response details"""
-    logger.debug(f"Response: {response.status_code}")
+    if request.path not in _UNLOGGED_PATHS:
+        logger.debug("Response: %s", response.status_code)
     return response
 
 
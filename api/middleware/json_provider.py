@@ -0,0 +1,59 @@
+"""
+orjson-backed JSON Provider for Flask
+
+Faster jsonify / request.get_json. Falls back to Flask's default provider
+when orjson is not installed.
+"""
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+import logging
+from typing import Any, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with orjson doing the encoding/decoding"""
+
+    # datetime/dataclass go through Flask's default() so output matches stdlib jsonify
+    _BASE_OPTIONS = 0
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = self._BASE_OPTIONS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+
+if ORJSON_AVAILABLE:
+    ORJSONProvider._BASE_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+
+def setup_json_provider(app: Flask):
+    """
+    Use orjson for app JSON responses when available
+
+    Usage:
+        setup_json_provider(app)
+    """
+    if ORJSON_AVAILABLE:
+        app.json = ORJSONProvider(app)
+    else:
+        logger.info("orjson not installed - using Flask's default JSON provider")
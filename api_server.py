@@ -5,9 +5,12 @@ Features: Auto-reload on CSV changes, improved error handling, centralized middl
 """
 
 from flask import Flask, request, render_template, redirect, url_for, jsonify, session
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.utils import secure_filename
 import os
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from data_processor import get_processor, refresh_data
 from datetime import datetime
@@ -24,9 +27,7 @@ except ImportError:
 # Import error handler middleware (with fallback)
 try:
     from api.middleware.error_handler import setup_error_handlers, setup_request_logging
-    ERROR_HANDLER_AVAILABLE = True
-except ImportError:
-    ERROR_HANDLER_AVAILABLE = False
+    from api.middleware.json_provider import setup_json_provider
     ERROR_HANDLER_AVAILABLE = True
 except ImportError:
     ERROR_HANDLER_AVAILABLE = False
@@ -35,7 +36,7 @@ except ImportError:
 # Import ETL Scheduler (with fallback)
 try:
     from etl_scheduler import get_scheduler
-    from aims_soap_client import is_aims_available
+    from aims_soap_client import is_aims_available, setup_logging as setup_aims_logging
     ETL_AVAILABLE = True
 except ImportError:
     ETL_AVAILABLE = False
@@ -44,32 +45,92 @@ except ImportError:
 app = Flask(__name__, template_folder='.')  # Look for templates in current dir
 app.secret_key = 'crew-dashboard-secret'  # Required for sessions if needed
 
+# AIMS client logs to the console and aims_errors.log (importing it configures no handlers)
+if ETL_AVAILABLE:
+    setup_aims_logging()
+
 # Setup error handlers
 if ERROR_HANDLER_AVAILABLE:
     setup_error_handlers(app)
+    setup_json_provider(app)
     # Uncomment for request logging:
     # setup_request_logging(app)
 
 # Configuration
 UPLOAD_FOLDER = Path(__file__).parent / 'uploads'
 UPLOAD_FOLDER.mkdir(exist_ok=True)
-ALLOWED_EXTENSIONS = {'csv'}
 
 app.config['UPLOAD_FOLDER'] = str(UPLOAD_FOLDER)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Keep compiled templates instead of re-checking the file on every render (set true while editing HTML)
+app.config['TEMPLATES_AUTO_RELOAD'] = os.getenv('TEMPLATES_AUTO_RELOAD', 'false').lower() == 'true'
+# Compiled template bytecode survives restarts - new workers skip parsing crew_dashboard.html
+JINJA_CACHE_FOLDER = Path(os.getenv('JINJA_CACHE_DIR') or Path(__file__).parent / '.jinja_cache')
+JINJA_CACHE_FOLDER.mkdir(exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(JINJA_CACHE_FOLDER))
+# Load it into the environment cache now so the first request renders at steady-state speed
+app.jinja_env.get_template('crew_dashboard.html')
+
+# Pre-load the AIMS WSDL in the background so the first request doesn't pay for it
+if ETL_AVAILABLE and is_aims_available():
+    from aims_soap_client import get_aims_client
+    get_aims_client().warmup_async()
+
+# Upload DB syncs (one per uploaded file) run on a shared pool
+_sync_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='upload-sync')
 
 # Global state for file watcher
 file_watcher = None
 last_update_time = datetime.now()
 pending_refresh = False
+# Pages poll /api/check_updates only when this is on (the Vercel app has no such route)
+AUTO_REFRESH_ENABLED = os.getenv('FEATURE_AUTO_REFRESH', 'true').lower() == 'true'
+
+def mark_data_updated():
+    """Bump the data version after a reload so polling pages pick it up"""
+    global pending_refresh, last_update_time
+    last_update_time = datetime.now()
+    pending_refresh = True
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Supabase / AIMS status shown on the dashboard, re-checked at most this often
+STATUS_CACHE_SECONDS = 10
+_service_status = None  # (db_connected, aims_enabled)
+_service_status_at = 0.0
+
+def get_service_status():
+    """(db_connected, aims_enabled), cached for STATUS_CACHE_SECONDS"""
+    global _service_status, _service_status_at
+    now = time.monotonic()
+    if _service_status is None or now - _service_status_at >= STATUS_CACHE_SECONDS:
+        # is_connected() retries create_client every call while Supabase is down/unconfigured
+        from supabase_client import is_connected
+        db_connected = is_connected()
+        try:
+            from aims_soap_client import is_aims_available
+            aims_enabled = is_aims_available()
+        except ImportError:
+            aims_enabled = False
+        _service_status = (db_connected, aims_enabled)
+        _service_status_at = now
+    return _service_status
+
+# Dashboard data per (date, context, source, base, data version). The TTL bounds how
+# stale the live AIMS crew override can get between reloads.
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '30'))
+_DASHBOARD_CACHE_MAX = 64
+_dashboard_cache = {}  # key -> (stored_at, data)
+_dashboard_cache_lock = threading.Lock()
+
+# Watched CSV -> processor method: (substrings the lowercased file name must contain, label, method)
+CSV_FILE_ROUTES = (
+    (('dayrep',), 'DayRepReport', 'process_dayrep_csv'),
+    (('sacutil',), 'SacutilReport', 'process_sacutil_csv'),
+    (('rolcr',), 'RolCrTotReport', 'process_rolcrtot_csv'),  # also matches 'rolcrtot'
+    (('crew', 'schedule'), 'Crew Schedule', 'process_crew_schedule_csv'),
+)
 
 def on_csv_file_change(file_path, event_type):
     """Callback when CSV files change"""
-    global pending_refresh, last_update_time
-    
     print(f"[Auto-Refresh] CSV file {event_type}: {file_path}")
     
     # Determine which file changed and process it
@@ -77,24 +138,17 @@ def on_csv_file_change(file_path, event_type):
     processor = get_processor()
     
     try:
-        if 'dayrep' in file_name:
-            print("[Auto-Refresh] Processing DayRepReport...")
-            processor.process_dayrep_csv(file_path=Path(file_path))
-        elif 'sacutil' in file_name:
-            print("[Auto-Refresh] Processing SacutilReport...")
-            processor.process_sacutil_csv(file_path=Path(file_path))
-        elif 'rolcrtot' in file_name or 'rolcr' in file_name:
-            print("[Auto-Refresh] Processing RolCrTotReport...")
-            processor.process_rolcrtot_csv(file_path=Path(file_path))
-        elif 'crew' in file_name and 'schedule' in file_name:
-            print("[Auto-Refresh] Processing Crew Schedule...")
-            processor.process_crew_schedule_csv(file_path=Path(file_path))
+        for needles, label, method_name in CSV_FILE_ROUTES:
+            if all(needle in file_name for needle in needles):
+                break
         else:
             print(f"[Auto-Refresh] Unknown CSV file type: {file_name}")
             return
         
-        pending_refresh = True
-        last_update_time = datetime.now()
+        print(f"[Auto-Refresh] Processing {label}...")
+        getattr(processor, method_name)(file_path=Path(file_path))
+        
+        mark_data_updated()
         print(f"[Auto-Refresh] Data updated successfully at {last_update_time.strftime('%H:%M:%S')}")
     except Exception as e:
         print(f"[Auto-Refresh] Error processing file: {e}")
@@ -149,41 +203,54 @@ def index():
     # FIX: Ignore the stale CSV date context when viewing AIMS data
     effective_date_context = date_context if source != 'aims' else None
 
-    # Get data
-    data = processor.get_dashboard_data(filter_date, effective_date_context, source=source, base=base)
-    
-    # Calculate compliance rate from rolling_hours
-    compliance_stats = processor.calculate_rolling_28day_stats()
-    data['compliance_rate'] = compliance_stats.get('compliance_rate', 100)
-    
-    # Add last update timestamp
-    data['last_updated'] = last_update_time.strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Check DB connection status for UI debugging
-    from supabase_client import is_connected
-    db_connected = is_connected()
+    # last_update_time is bumped on every reload, so older entries are never hit again
+    context_key = tuple(sorted(effective_date_context.items())) if isinstance(effective_date_context, dict) else None
+    cache_key = (filter_date, context_key, source, base, last_update_time)
+    with _dashboard_cache_lock:
+        entry = _dashboard_cache.get(cache_key)
+    if entry and time.monotonic() - entry[0] < DASHBOARD_CACHE_TTL:
+        data = entry[1]
+    else:
+        # Get data
+        data = processor.get_dashboard_data(filter_date, effective_date_context, source=source, base=base)
+        
+        # Calculate compliance rate from rolling_hours
+        compliance_stats = processor.calculate_rolling_28day_stats()
+        data['compliance_rate'] = compliance_stats.get('compliance_rate', 100)
+        
+        # Add last update timestamp
+        data['last_updated'] = last_update_time.strftime('%Y-%m-%d %H:%M:%S')
+        
+        if DASHBOARD_CACHE_TTL > 0:
+            with _dashboard_cache_lock:
+                if len(_dashboard_cache) >= _DASHBOARD_CACHE_MAX:
+                    _dashboard_cache.clear()
+                _dashboard_cache[cache_key] = (time.monotonic(), data)
     
-    # Check AIMS availability
-    try:
-        from aims_soap_client import is_aims_available
-        aims_enabled = is_aims_available()
-    except ImportError:
-        aims_enabled = False
+    # DB connection / AIMS availability for the UI badges
+    db_connected, aims_enabled = get_service_status()
     
     # Render template with data
     return render_template('crew_dashboard.html', 
                           data=data, 
                           filter_date=filter_date, 
                           db_connected=db_connected,
-                          aims_enabled=aims_enabled)
+                          aims_enabled=aims_enabled,
+                          auto_refresh=AUTO_REFRESH_ENABLED,
+                          data_version=last_update_time.isoformat())
 
 @app.route('/api/check_updates', methods=['GET'])
 def check_updates():
     """API endpoint to check if data has been updated"""
-    global pending_refresh, last_update_time
+    global pending_refresh
     
-    has_update = pending_refresh
-    pending_refresh = False  # Reset flag
+    # Pages send the version they were rendered with; each tab compares its own, nothing is consumed
+    since = request.args.get('since')
+    if since is not None:
+        has_update = since != last_update_time.isoformat()
+    else:
+        has_update = pending_refresh
+        pending_refresh = False  # Reset flag
     
     return jsonify({
         'has_update': has_update,
@@ -194,11 +261,9 @@ def check_updates():
 @app.route('/refresh', methods=['GET'])
 def force_refresh():
     """Manually trigger data reload from source"""
-    global last_update_time, pending_refresh
     try:
         refresh_data()
-        last_update_time = datetime.now()
-        pending_refresh = True
+        mark_data_updated()
         return jsonify({'status': 'success', 'message': 'Data reloaded from source'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -207,19 +272,20 @@ def force_refresh():
 def upload_files():
     """Handle file uploads via standard HTML Form - In-Memory Processing for Vercel/Supabase"""
     
-    # Map form field names to processor methods
+    # Map form field names to processor parse / Supabase sync methods
     file_map = {
-        'dayrep': 'process_dayrep_csv',
-        'sacutil': 'process_sacutil_csv',
-        'rolcrtot': 'process_rolcrtot_csv',
-        'crew_schedule': 'process_crew_schedule_csv'
+        'dayrep': ('process_dayrep_csv', 'sync_flights_to_db'),
+        'sacutil': ('process_sacutil_csv', 'sync_ac_utilization_to_db'),
+        'rolcrtot': ('process_rolcrtot_csv', 'sync_rolling_hours_to_db'),
+        'crew_schedule': ('process_crew_schedule_csv', 'sync_crew_schedule_to_db')
     }
     
     processor = get_processor()
     uploaded_any = False
     errors = []
+    syncs = []  # (field_name, sync method) for every file parsed
     
-    for field_name, method_name in file_map.items():
+    for field_name, (method_name, sync_name) in file_map.items():
         if field_name in request.files:
             file = request.files[field_name]
             # Check if file is selected
@@ -238,10 +304,12 @@ def upload_files():
                     
                     # Process directly with content
                     # Pass the filename as a Path object so the processor can use it for date parsing
-                    result = process_method(file_content=content, file_path=Path(file.filename))
+                    # Parsers share processor state, so they run in order; DB writes come after
+                    result = process_method(file_content=content, file_path=Path(file.filename), sync_db=False)
                     
                     if result is not None and result > 0:
                         uploaded_any = True
+                        syncs.append((field_name, getattr(processor, sync_name)))
                         print(f"Processed {field_name}: {result} records")
                     else:
                         errors.append(f"{field_name}: No data processed")
@@ -251,10 +319,22 @@ def upload_files():
                     errors.append(error_msg)
                     print(f"Error processing {field_name}: {e}")
     
+    # Each file replaces its own tables - send them to Supabase side by side
+    if syncs:
+        from supabase_client import is_connected
+        if is_connected():
+            futures = [(field_name, _sync_executor.submit(sync)) for field_name, sync in syncs]
+            for field_name, future in futures:
+                try:
+                    # db.insert_* log their own errors and return None on failure
+                    if future.result() is None:
+                        errors.append(f"{field_name}: DB sync failed")
+                except Exception as e:
+                    errors.append(f"{field_name}: DB sync failed: {e}")
+                    print(f"Error syncing {field_name}: {e}")
+    
     if uploaded_any:
-        global last_update_time, pending_refresh
-        last_update_time = datetime.now()
-        pending_refresh = True
+        mark_data_updated()
         
         # Save upload context to session
         if processor.upload_date_context and processor.upload_date_context.get('min_date'):
@@ -291,40 +371,43 @@ def debug_info():
     }
 
 if __name__ == '__main__':
-    # Initialize processor on startup
-    get_processor()
+    # DEBUG=true runs Werkzeug's reloader: a supervisor process that only watches the code
+    # and a child (WERKZEUG_RUN_MAIN=true) that serves - start data and services in the child only
+    debug = os.getenv('DEBUG', 'false').lower() == 'true'
+    serving_process = not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
     
-    # Start file watcher in a separate thread
-    if FILE_WATCHER_AVAILABLE:
-        watcher_thread = threading.Thread(target=start_file_watcher, daemon=True)
-        watcher_thread = threading.Thread(target=start_file_watcher, daemon=True)
-        watcher_thread.start()
+    if serving_process:
+        # Initialize processor on startup
+        get_processor()
+    
+        # Start file watcher in a separate thread
+        if FILE_WATCHER_AVAILABLE:
+            watcher_thread = threading.Thread(target=start_file_watcher, daemon=True)
+            watcher_thread.start()
 
-    # Start ETL Scheduler if AIMS is enabled
-    if ETL_AVAILABLE and is_aims_available():
-        try:
-            scheduler = get_scheduler()
+        # Start ETL Scheduler if AIMS is enabled
+        if ETL_AVAILABLE and is_aims_available():
+            try:
+                scheduler = get_scheduler()
             
-            # Add callback to trigger front-end refresh on sync success
-            def trigger_refresh():
-                global pending_refresh, last_update_time
-                try:
-                    # Reload data into memory from Supabase
-                    proc = get_processor()
-                    print("!!! Sync success - Reloading data from Supabase into memory...")
-                    proc.load_from_supabase()
+                # Add callback to trigger front-end refresh on sync success
+                def trigger_refresh():
+                    try:
+                        # Reload data into memory from Supabase
+                        proc = get_processor()
+                        print("!!! Sync success - Reloading data from Supabase into memory...")
+                        proc.load_from_supabase()
                     
-                    pending_refresh = True
-                    last_update_time = datetime.now()
-                    print(f"!!! ETL Sync success - Refresh triggered at {last_update_time} !!!", flush=True)
-                except Exception as e:
-                    print(f"Error in refresh callback: {e}")
+                        mark_data_updated()
+                        print(f"!!! ETL Sync success - Refresh triggered at {last_update_time} !!!", flush=True)
+                    except Exception as e:
+                        print(f"Error in refresh callback: {e}")
             
-            scheduler.on_success = trigger_refresh
-            scheduler.start()
-            print(f"Auto-sync enabled - AIMS ETL Scheduler started (Interval: {scheduler.interval_minutes}m)")
-        except Exception as e:
-            print(f"Failed to start ETL Scheduler: {e}")
+                scheduler.on_success = trigger_refresh
+                scheduler.start()
+                print(f"Auto-sync enabled - AIMS ETL Scheduler started (Interval: {scheduler.interval_minutes}m)")
+            except Exception as e:
+                print(f"Failed to start ETL Scheduler: {e}")
     
     print("============================================================")
     print("Crew Management Dashboard (SSR Version)")
@@ -340,5 +423,7 @@ if __name__ == '__main__':
     print("")
     print("Press Ctrl+C to stop")
     print("============================================================")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # watchdog is already a dependency - reload on file events instead of polling stat()
+    app.run(host='0.0.0.0', port=5000, debug=debug, threaded=True,
+            reloader_type='watchdog' if FILE_WATCHER_AVAILABLE else 'stat')
 
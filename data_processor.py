@@ -6,10 +6,20 @@ Handles CSV parsing and KPI calculations
 import csv
 import re
 import json
-from collections import defaultdict
+from collections import Counter, defaultdict
+from operator import itemgetter
 from datetime import datetime
 from pathlib import Path
 import supabase_client as db
+from utils.date_utils import parse_time_to_minutes
+
+# '-NAME(ROLE) ID' entries in a flight's crew string
+CREW_RE = re.compile(r'\(([A-Z]{2})\)\s*(\d+)')
+
+# ac_utilization columns, read in one call per row
+UTIL_FIELDS = ('date', 'ac_type', 'dom_block', 'int_block', 'total_block',
+               'dom_cycles', 'int_cycles', 'total_cycles', 'avg_util')
+UTIL_ROW = itemgetter(*UTIL_FIELDS)
 
 class DataProcessor:
     def __init__(self, data_dir=None):
@@ -159,21 +169,24 @@ class DataProcessor:
         if db_util:
             self.ac_utilization = {}
             self.ac_utilization_by_date = defaultdict(dict)
+            # get_ac_utilization returns a flat list - rebuild the nested date -> type dict
             for item in db_util:
-                date_str = item.get('date')
-                ac_type = item.get('ac_type') # Note: db might use different keys if I inserted differently, but let's assume consistent
-                # Actually get_ac_utilization returns flat list. 
-                # Need to check how I insert it. I insert flat list.
-                # So here I reconstruct the nested dict.
+                try:
+                    row = UTIL_ROW(item)
+                except KeyError:
+                    # Older rows may lack a column - missing values are None, as with .get()
+                    row = tuple(item.get(field) for field in UTIL_FIELDS)
+                (date_str, ac_type, dom_block, int_block, total_block,
+                 dom_cycles, int_cycles, total_cycles, avg_util) = row
                 if date_str and ac_type:
                      self.ac_utilization_by_date[date_str][ac_type] = {
-                         'dom_block': item.get('dom_block'),
-                         'int_block': item.get('int_block'),
-                         'total_block': item.get('total_block'),
-                         'dom_cycles': str(item.get('dom_cycles')),
-                         'int_cycles': str(item.get('int_cycles')),
-                         'total_cycles': str(item.get('total_cycles')),
-                         'avg_util': item.get('avg_util')
+                         'dom_block': dom_block,
+                         'int_block': int_block,
+                         'total_block': total_block,
+                         'dom_cycles': str(dom_cycles),
+                         'int_cycles': str(int_cycles),
+                         'total_cycles': str(total_cycles),
+                         'avg_util': avg_util
                      }
             # Re-summarize totals? Or just trust what's there?
             # Creating self.ac_utilization (total) from daily? 
@@ -198,10 +211,11 @@ class DataProcessor:
              for item in db_schedule:
                  d = item.get('date')
                  s = item.get('status_type')
+                 n = item.get('count') or 1
                  if d and s:
-                     self.crew_schedule_by_date[d][s] += 1
+                     self.crew_schedule_by_date[d][s] += n
                  if s:
-                     self.crew_schedule['summary'][s] += 1
+                     self.crew_schedule['summary'][s] += n
              print(f"Loaded Crew Schedule from Supabase")
         
         # 5. Standby Records (new table with individual crew data)
@@ -278,13 +292,7 @@ class DataProcessor:
         
     def parse_time(self, time_str):
         """Parse time string HH:MM to minutes from midnight"""
-        if not time_str or ':' not in time_str:
-            return None
-        try:
-            parts = time_str.split(':')
-            return int(parts[0]) * 60 + int(parts[1])
-        except (ValueError, TypeError, IndexError):
-            return None
+        return parse_time_to_minutes(time_str)
     
     def get_operating_date(self, calendar_date, time_str):
         """
@@ -321,9 +329,7 @@ class DataProcessor:
     
     def extract_crew_ids(self, crew_string):
         """Extract crew IDs from crew string like '-NAME(ROLE) ID'"""
-        pattern = r'\(([A-Z]{2})\)\s*(\d+)'
-        matches = re.findall(pattern, crew_string)
-        return [(role, id) for role, id in matches]
+        return CREW_RE.findall(crew_string)
     
     def get_crew_set_key(self, crew_string):
         """Get a unique key for a crew set (sorted crew IDs)"""
@@ -560,23 +566,8 @@ class DataProcessor:
         self._existing_flight_keys = set(self._get_flight_key(f) for f in self.flights)
         
         # INSERT TO SUPABASE
-        if sync_db and db.is_connected() and len(self.flights) > 0:
-            print("syncing flights to supabase...")
-            flights_payload = []
-            for flight in self.flights:
-                flights_payload.append({
-                    'date': flight.get('date', ''),
-                    'calendar_date': flight.get('calendar_date', ''),
-                    'reg': flight.get('reg', ''),
-                    'ac_type': flight.get('ac_type', 'A320'),  # Include A/C Type
-                    'flt': flight.get('flt', ''),
-                    'dep': flight.get('dep', ''),
-                    'arr': flight.get('arr', ''),
-                    'std': flight.get('std', ''),
-                    'sta': flight.get('sta', ''),
-                    'crew': flight.get('crew', '')
-                })
-            db.insert_flights(flights_payload)
+        if sync_db and db.is_connected():
+            self.sync_flights_to_db()
         
         return len(self.flights)
     
@@ -594,7 +585,7 @@ class DataProcessor:
     def process_sacutil_csv(self, file_path=None, file_content=None, sync_db=True):
         """Process SacutilReport CSV file"""
         self.ac_utilization = {}
-        self.ac_utilization_by_date.clear()
+        self.ac_utilization_by_date = defaultdict(dict)
         
         if file_content:
             content = self._decode_content_safe(file_content)
@@ -763,29 +754,8 @@ class DataProcessor:
             }
         
         # INSERT TO SUPABASE
-        if sync_db and db.is_connected() and len(self.ac_utilization_by_date) > 0:
-            print("syncing ac_utilization to supabase...")
-            util_data = []
-            for date_str, ac_types in self.ac_utilization_by_date.items():
-                for ac_type, stats in ac_types.items():
-                    util_data.append({
-                        'date': date_str,
-                        'ac_type': ac_type,
-                        'dom_block': stats.get('dom_block', '00:00') if isinstance(stats.get('dom_block'), str) else self.min_to_time(stats.get('dom_block_min', 0)), # Handle if stats are mixed, but usually formatted strings by now
-                        'int_block': stats.get('int_block', '00:00'),
-                        'total_block': stats.get('total_block', '00:00'),
-                        'dom_cycles': int(stats.get('dom_cycles', 0)),
-                        'int_cycles': int(stats.get('int_cycles', 0)),
-                        'total_cycles': int(stats.get('total_cycles', 0)),
-                        'avg_util': stats.get('avg_util', '')
-                    })
-            # Ensure safe string formatting if not already
-            # Actually process_sacutil_csv earlier converts to strings in self.ac_utilization_by_date
-            # So I should just take the strings.
-            # But wait, self.ac_utilization_by_date values are DICTS of strings (lines 471-479).
-            # So stats['dom_block'] is "HH:MM".
-            
-            db.insert_ac_utilization(util_data)
+        if sync_db and db.is_connected():
+            self.sync_ac_utilization_to_db()
 
         return len(self.ac_utilization)
     
@@ -850,6 +820,16 @@ class DataProcessor:
         # Column 0: ID, Column 1: Name, Column 2: Seniority, Column 3: 28-Day Block, Column 4: 12-Month Block
         header_map = {'id': 0, 'name': 1, 'seniority': 2, 'block_28day': 3, 'block_12month': 4}
 
+        # Parse hours from HH:MM format
+        def parse_hours(time_str):
+            try:
+                hours, sep, minutes = time_str.partition(':')
+                if sep:
+                    return float(hours) + float(minutes) / 60
+                return 0.0
+            except (ValueError, TypeError, AttributeError):
+                return 0.0
+
         for row in rows[data_start_idx:]:
             if len(row) < 4: continue
             
@@ -865,16 +845,6 @@ class DataProcessor:
                 b28 = row[header_map['block_28day']].strip() if len(row) > 3 else '0:00'
                 b12m = row[header_map['block_12month']].strip() if len(row) > 4 else '0:00'
                 
-                # Parse hours from HH:MM format
-                def parse_hours(time_str):
-                    try:
-                        if ':' in time_str:
-                            h, m = time_str.split(':')
-                            return float(h) + float(m) / 60
-                        return 0.0
-                    except (ValueError, TypeError, AttributeError):
-                        return 0.0
-                
                 hours_28day = parse_hours(b28)
                 hours_12month = parse_hours(b12m)
                 
@@ -905,22 +875,8 @@ class DataProcessor:
         self.rolling_hours.sort(key=lambda x: x['hours_28day'], reverse=True)
         
         # INSERT TO SUPABASE
-        if sync_db and db.is_connected() and len(self.rolling_hours) > 0:
-            print("syncing rolling_hours to supabase...")
-            hours_data = []
-            for item in self.rolling_hours:
-                hours_data.append({
-                    'crew_id': item.get('id', ''),
-                    'name': item.get('name', ''),
-                    'seniority': item.get('seniority', ''),
-                    'block_28day': item.get('block_28day', '0:00'),
-                    'block_12month': item.get('block_12month', '0:00'),
-                    'hours_28day': item.get('hours_28day', 0),
-                    'hours_12month': item.get('hours_12month', 0),
-                    'percentage': item.get('percentage', 0),
-                    'status': item.get('status', 'normal')
-                })
-            db.insert_rolling_hours(hours_data)
+        if sync_db and db.is_connected():
+            self.sync_rolling_hours_to_db()
             
         return len(self.rolling_hours)
     
@@ -986,9 +942,10 @@ class DataProcessor:
                 print(f"Error reading file {file_path}: {e}")
                 return 0
         
-        # Reset data
-        self.crew_schedule['summary'] = {'SL': 0, 'CSL': 0, 'SBY': 0, 'OSBY': 0, 'FGT': 0, 'OFF': 0, 'NO_DUTY': 0}
-        self.crew_schedule_by_date.clear()
+        # Reset data (rebind crew_schedule itself - a processor copy must not write into the shared dict)
+        self.crew_schedule = {**self.crew_schedule,
+                              'summary': {'SL': 0, 'CSL': 0, 'SBY': 0, 'OSBY': 0, 'FGT': 0, 'OFF': 0, 'NO_DUTY': 0}}
+        self.crew_schedule_by_date = defaultdict(lambda: {'SL': 0, 'CSL': 0, 'SBY': 0, 'OSBY': 0})
         self.standby_records = []
         
         # Read CSV with header detection
@@ -1246,26 +1203,7 @@ class DataProcessor:
 
         # INSERT TO SUPABASE (both legacy crew_schedule and new standby_records)
         if sync_db and db.is_connected():
-            print("syncing crew_schedule to supabase...")
-            
-            # Legacy crew_schedule table
-            schedule_data = []
-            for date_str, counts in self.crew_schedule_by_date.items():
-                for status_type in ['SL', 'CSL', 'SBY', 'OSBY']:
-                    count = counts.get(status_type, 0)
-                    for _ in range(count):
-                        schedule_data.append({
-                            'date': date_str,
-                            'status_type': status_type
-                        })
-            
-            if schedule_data:
-                db.insert_crew_schedule(schedule_data)
-            
-            # New standby_records table
-            if self.standby_records:
-                print(f"syncing {len(self.standby_records)} standby_records to supabase...")
-                db.upsert_standby_records(self.standby_records)
+            self.sync_crew_schedule_to_db()
 
         # After processing, update the global upload_date_context
         # to ensure the dashboard picks up the new date range immediately
@@ -1282,9 +1220,101 @@ class DataProcessor:
 
         return sum(self.crew_schedule['summary'].values())
 
+    # ============================================================
+    # Supabase Sync (called by process_*_csv, or separately after sync_db=False)
+    # Each returns the rows written (0 if there is nothing to write), None on failure
+    # ============================================================
 
+    def sync_flights_to_db(self):
+        """Replace the flights table with self.flights"""
+        if not self.flights:
+            return 0
+        print("syncing flights to supabase...")
+        flights_payload = []
+        for flight in self.flights:
+            flights_payload.append({
+                'date': flight.get('date', ''),
+                'calendar_date': flight.get('calendar_date', ''),
+                'reg': flight.get('reg', ''),
+                'ac_type': flight.get('ac_type', 'A320'),  # Include A/C Type
+                'flt': flight.get('flt', ''),
+                'dep': flight.get('dep', ''),
+                'arr': flight.get('arr', ''),
+                'std': flight.get('std', ''),
+                'sta': flight.get('sta', ''),
+                'crew': flight.get('crew', '')
+            })
+        return db.insert_flights(flights_payload)
+
+    def sync_ac_utilization_to_db(self):
+        """Replace the ac_utilization table with self.ac_utilization_by_date"""
+        if not self.ac_utilization_by_date:
+            return 0
+        print("syncing ac_utilization to supabase...")
+        util_data = []
+        for date_str, ac_types in self.ac_utilization_by_date.items():
+            for ac_type, stats in ac_types.items():
+                util_data.append({
+                    'date': date_str,
+                    'ac_type': ac_type,
+                    'dom_block': stats.get('dom_block', '00:00') if isinstance(stats.get('dom_block'), str) else self.min_to_time(stats.get('dom_block_min', 0)), # Handle if stats are mixed, but usually formatted strings by now
+                    'int_block': stats.get('int_block', '00:00'),
+                    'total_block': stats.get('total_block', '00:00'),
+                    'dom_cycles': int(stats.get('dom_cycles', 0)),
+                    'int_cycles': int(stats.get('int_cycles', 0)),
+                    'total_cycles': int(stats.get('total_cycles', 0)),
+                    'avg_util': stats.get('avg_util', '')
+                })
+        return db.insert_ac_utilization(util_data)
+
+    def sync_rolling_hours_to_db(self):
+        """Replace the rolling_hours table with self.rolling_hours"""
+        if not self.rolling_hours:
+            return 0
+        print("syncing rolling_hours to supabase...")
+        hours_data = []
+        for item in self.rolling_hours:
+            hours_data.append({
+                'crew_id': item.get('id', ''),
+                'name': item.get('name', ''),
+                'seniority': item.get('seniority', ''),
+                'block_28day': item.get('block_28day', '0:00'),
+                'block_12month': item.get('block_12month', '0:00'),
+                'hours_28day': item.get('hours_28day', 0),
+                'hours_12month': item.get('hours_12month', 0),
+                'percentage': item.get('percentage', 0),
+                'status': item.get('status', 'normal')
+            })
+        return db.insert_rolling_hours(hours_data)
+
+    def sync_crew_schedule_to_db(self):
+        """Write crew_schedule counts and standby_records"""
+        print("syncing crew_schedule to supabase...")
+        written = 0
+        
+        # Legacy crew_schedule table (one row per date/status with its count)
+        schedule_data = [
+            {'date': date_str, 'status_type': status_type, 'count': counts[status_type]}
+            for date_str, counts in self.crew_schedule_by_date.items()
+            for status_type in ('SL', 'CSL', 'SBY', 'OSBY') if counts.get(status_type)
+        ]
+        
+        if schedule_data:
+            result = db.insert_crew_schedule(schedule_data)
+            if result is None:
+                return None
+            written += result
+        
+        # New standby_records table
+        if self.standby_records:
+            print(f"syncing {len(self.standby_records)} standby_records to supabase...")
+            result = db.upsert_standby_records(self.standby_records)
+            if result is None:
+                return None
+            written += result
+        
+        return written
 
-    
     def calculate_metrics(self, filter_date=None, date_context=None):
         """Calculate all dashboard KPIs, optionally filtered by date"""
         # Determine which data to use based on filter
@@ -1485,10 +1515,9 @@ class DataProcessor:
             })
         
         # Calculate rolling hours statistics
-        rolling_stats = {'normal': 0, 'warning': 0, 'critical': 0}
+        status_counts = Counter(crew['status'] for crew in self.rolling_hours)
+        rolling_stats = {k: status_counts[k] for k in ('normal', 'warning', 'critical')}
         compliance_rate = 0
-        for crew in self.rolling_hours:
-            rolling_stats[crew['status']] += 1
             
         if self.rolling_hours:
             safe_crew = rolling_stats['normal'] + rolling_stats['warning']
@@ -1989,14 +2018,11 @@ class DataProcessor:
         
         stats['total_crew'] = len(self.rolling_hours)
         
-        for crew in self.rolling_hours:
-            status = crew.get('status', 'normal')
-            if status == 'critical':
-                stats['critical_count'] += 1
-            elif status == 'warning':
-                stats['warning_count'] += 1
-            else:
-                stats['normal_count'] += 1
+        # Anything not critical/warning counts as normal
+        status_counts = Counter(crew.get('status', 'normal') for crew in self.rolling_hours)
+        stats['critical_count'] = status_counts['critical']
+        stats['warning_count'] = status_counts['warning']
+        stats['normal_count'] = stats['total_crew'] - stats['critical_count'] - stats['warning_count']
         
         if stats['total_crew'] > 0:
             stats['compliance_rate'] = round(
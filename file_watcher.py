@@ -7,46 +7,58 @@ import time
 import threading
 from pathlib import Path
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from watchdog.events import PatternMatchingEventHandler
 from datetime import datetime
 
-class CSVFileHandler(FileSystemEventHandler):
+class CSVFileHandler(PatternMatchingEventHandler):
     """Handles file system events for CSV files"""
     
-    def __init__(self, callback, debounce_seconds=2):
-        super().__init__()
+    def __init__(self, callback, debounce_seconds=0.5):
+        # Non-CSV paths and directories are dropped by watchdog before our handlers run
+        super().__init__(patterns=['*.csv', '*.CSV'], ignore_directories=True)
         self.callback = callback
         self.debounce_seconds = debounce_seconds
-        self.last_modified = {}
-        self.csv_extensions = ['.csv', '.CSV']
-        
-    def _is_csv_file(self, path):
-        """Check if file is a CSV file"""
-        return any(path.endswith(ext) for ext in self.csv_extensions)
+        self._timers = {}  # file_path -> pending threading.Timer
+        self._lock = threading.Lock()
+        self._callback_lock = threading.Lock()  # one reprocess at a time, as on the observer thread
+    
+    def _schedule(self, file_path, event_type):
+        """(Re)start the quiet-period timer - a save burst triggers one callback after it settles"""
+        with self._lock:
+            pending = self._timers.get(file_path)
+            if pending:
+                pending.cancel()
+            timer = threading.Timer(self.debounce_seconds, self._fire, args=(file_path, event_type))
+            timer.daemon = True
+            self._timers[file_path] = timer
+            timer.start()
     
-    def _should_process(self, file_path):
-        """Check if file should be processed (debouncing)"""
-        now = time.time()
-        last_time = self.last_modified.get(file_path, 0)
+    def _fire(self, file_path, event_type):
+        """Timer expired with no newer event for this file"""
+        with self._lock:
+            # A newer event may have replaced this timer just as it fired
+            if self._timers.get(file_path) is not threading.current_thread():
+                return
+            del self._timers[file_path]
         
-        if now - last_time > self.debounce_seconds:
-            self.last_modified[file_path] = now
-            return True
-        return False
+        print(f"[File Watcher] Detected {event_type} file: {file_path}")
+        with self._callback_lock:
+            self.callback(file_path, event_type)
+    
+    def cancel_pending(self):
+        """Drop callbacks that haven't fired yet"""
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
     
     def on_modified(self, event):
         """Called when a file is modified"""
-        if not event.is_directory and self._is_csv_file(event.src_path):
-            if self._should_process(event.src_path):
-                print(f"[File Watcher] Detected change: {event.src_path}")
-                self.callback(event.src_path, 'modified')
+        self._schedule(event.src_path, 'modified')
     
     def on_created(self, event):
         """Called when a file is created"""
-        if not event.is_directory and self._is_csv_file(event.src_path):
-            if self._should_process(event.src_path):
-                print(f"[File Watcher] Detected new file: {event.src_path}")
-                self.callback(event.src_path, 'created')
+        self._schedule(event.src_path, 'created')
 
 class FileWatcher:
     """File watcher service that monitors CSV files"""
@@ -63,6 +75,7 @@ class FileWatcher:
         self.watch_directory = Path(watch_directory)
         self.callback = callback
         self.observer = None
+        self.event_handler = None
         self.is_running = False
         
     def start(self):
@@ -75,9 +88,9 @@ class FileWatcher:
             print(f"[File Watcher] Directory does not exist: {self.watch_directory}")
             return
         
-        event_handler = CSVFileHandler(self.callback)
+        self.event_handler = CSVFileHandler(self.callback)
         self.observer = Observer()
-        self.observer.schedule(event_handler, str(self.watch_directory), recursive=False)
+        self.observer.schedule(self.event_handler, str(self.watch_directory), recursive=False)
         self.observer.start()
         self.is_running = True
         
@@ -92,6 +105,7 @@ class FileWatcher:
         if self.observer:
             self.observer.stop()
             self.observer.join()
+            self.event_handler.cancel_pending()
             self.is_running = False
             print("[File Watcher] Stopped monitoring")
     
@@ -5,6 +5,8 @@ Works with both local development and Vercel deployment
 """
 
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Try to load dotenv for local development, skip if not available (Vercel)
 try:
@@ -64,6 +66,71 @@ def is_connected():
     return get_client() is not None
 
 
+# SQL functions from supabase_schema.sql. When PostgREST reports a function as not
+# deployed, callers fall back to plain table reads and the function is not tried
+# again for RPC_MISSING_RETRY_SECONDS. Other failures (network, timeout, 5xx) only
+# affect the current call.
+RPC_MISSING_RETRY_SECONDS = 600
+_missing_rpcs = {}  # name -> time.monotonic() when PostgREST said it doesn't exist
+
+# PGRST202: function not in PostgREST's schema cache; 42883: undefined_function
+_RPC_MISSING_CODES = {'PGRST202', '42883'}
+
+def _rpc_is_missing(error: Exception) -> bool:
+    """True if the RPC failed because the SQL function does not exist"""
+    code = getattr(error, 'code', None)
+    return code in _RPC_MISSING_CODES or str(code) == '404'
+
+def _call_rpc(name: str, params: dict = None):
+    """Call a Postgres function through PostgREST; None if it is unavailable"""
+    client = get_client()
+    if not client:
+        return None
+    missing_since = _missing_rpcs.get(name)
+    if missing_since is not None and time.monotonic() - missing_since < RPC_MISSING_RETRY_SECONDS:
+        return None
+    
+    try:
+        result = client.rpc(name, params or {}).execute().data
+        _missing_rpcs.pop(name, None)
+        return result
+    except Exception as e:
+        if _rpc_is_missing(e):
+            print(f"{name} RPC not deployed, falling back to table reads: {e}")
+            _missing_rpcs[name] = time.monotonic()
+        else:
+            print(f"{name} RPC failed, falling back to table reads for this call: {e}")
+        return None
+
+
+# Insert batches are independent REST calls, so they are sent concurrently
+INSERT_BATCH_SIZE = 500
+INSERT_WORKERS = int(os.getenv("SUPABASE_INSERT_WORKERS", "8"))
+# One pool for the process - threads are started on first use and reused across uploads
+_insert_executor = ThreadPoolExecutor(max_workers=max(INSERT_WORKERS, 1), thread_name_prefix='supabase-insert')
+
+def _insert_batches(client, table: str, rows: list, batch_size: int = INSERT_BATCH_SIZE):
+    """Insert rows into table in batches, several batches in flight at once"""
+    batches = [rows[i:i+batch_size] for i in range(0, len(rows), batch_size)]
+    if len(batches) <= 1:
+        for batch in batches:
+            client.table(table).insert(batch).execute()
+        return
+    
+    futures = [_insert_executor.submit(lambda b: client.table(table).insert(b).execute(), batch)
+               for batch in batches]
+    # Log every failed batch, then raise so callers keep their error handling
+    errors = []
+    for index, future in enumerate(futures):
+        try:
+            future.result()
+        except Exception as e:
+            print(f"Supabase insert into {table}: batch {index + 1}/{len(batches)} failed: {e}")
+            errors.append(e)
+    if errors:
+        raise errors[0]
+
+
 # ==================== FLIGHTS TABLE ====================
 
 def insert_flights(flights_data: list):
@@ -79,10 +146,7 @@ def insert_flights(flights_data: list):
         client.table('flights').delete().neq('id', '00000000-0000-0000-0000-000000000000').execute()
         
         # Insert new data in batches of 500
-        batch_size = 500
-        for i in range(0, len(flights_data), batch_size):
-            batch = flights_data[i:i+batch_size]
-            client.table('flights').insert(batch).execute()
+        _insert_batches(client, 'flights', flights_data)
         
         return len(flights_data)
     except Exception as e:
@@ -138,12 +202,15 @@ def get_available_dates():
         return []
     
     try:
-        def q_func():
-            return client.table('flights').select('date')
-        all_data = _fetch_all(q_func)
+        # DISTINCT runs in Postgres (index on flights.date); full column scan only as fallback
+        all_data = _call_rpc('flight_dates')
+        if all_data is None:
+            def q_func():
+                return client.table('flights').select('date')
+            all_data = _fetch_all(q_func)
         
         if all_data:
-            dates = list(set([r['date'] for r in all_data]))
+            dates = list({r['date'] for r in all_data})
             # Sort dates chronologically
             try:
                 dates.sort(key=lambda d: tuple(map(int, d.split('/')[::-1])))
@@ -169,10 +236,7 @@ def insert_ac_utilization(util_data: list):
         client.table('ac_utilization').delete().neq('id', '00000000-0000-0000-0000-000000000000').execute()
         
         # Insert new data
-        batch_size = 500
-        for i in range(0, len(util_data), batch_size):
-            batch = util_data[i:i+batch_size]
-            client.table('ac_utilization').insert(batch).execute()
+        _insert_batches(client, 'ac_utilization', util_data)
         
         return len(util_data)
     except Exception as e:
@@ -211,10 +275,7 @@ def upsert_rolling_hours(hours_data: list):
         client.table('rolling_hours').delete().neq('id', '00000000-0000-0000-0000-000000000000').execute()
         
         # Insert new data in batches
-        batch_size = 500
-        for i in range(0, len(hours_data), batch_size):
-            batch = hours_data[i:i+batch_size]
-            client.table('rolling_hours').insert(batch).execute()
+        _insert_batches(client, 'rolling_hours', hours_data)
         
         return len(hours_data)
     except Exception as e:
@@ -226,6 +287,17 @@ def insert_rolling_hours(hours_data: list):
     """Insert rolling hours records (legacy - calls upsert)"""
     return upsert_rolling_hours(hours_data)
 
+def get_rolling_hours_dashboard(top_n: int = 20):
+    """
+    Top-N rolling hours rows and per-status counts in one round-trip
+    (rolling_hours_dashboard SQL function). Returns None if the function
+    is not deployed so callers can fall back to get_rolling_hours().
+    """
+    data = _call_rpc('rolling_hours_dashboard', {'top_n': top_n})
+    if data is None:
+        return None
+    return {'items': data.get('items') or [], 'counts': data.get('counts') or {}}
+
 def get_rolling_hours():
     """Get all rolling hours data"""
     client = get_client()
@@ -254,10 +326,7 @@ def upsert_standby_records(records: list):
         client.table('standby_records').delete().neq('id', '00000000-0000-0000-0000-000000000000').execute()
         
         # Insert in batches
-        batch_size = 500
-        for i in range(0, len(records), batch_size):
-            batch = records[i:i+batch_size]
-            client.table('standby_records').insert(batch).execute()
+        _insert_batches(client, 'standby_records', records)
         
         return len(records)
     except Exception as e:
@@ -311,10 +380,7 @@ def insert_crew_schedule(schedule_data: list):
         client.table('crew_schedule').delete().neq('id', '00000000-0000-0000-0000-000000000000').execute()
         
         # Insert new data
-        batch_size = 500
-        for i in range(0, len(schedule_data), batch_size):
-            batch = schedule_data[i:i+batch_size]
-            client.table('crew_schedule').insert(batch).execute()
+        _insert_batches(client, 'crew_schedule', schedule_data)
         
         return len(schedule_data)
     except Exception as e:
@@ -346,7 +412,8 @@ def get_crew_schedule_summary(filter_date: str = None):
     for record in data:
         status = record.get('status_type', '')
         if status in summary:
-            summary[status] += 1
+            # Rows carry a count per (date, status_type); legacy rows count as 1
+            summary[status] += record.get('count') or 1
     return summary
 
 
@@ -23,6 +23,14 @@ CREATE TABLE IF NOT EXISTS flights (
 CREATE INDEX IF NOT EXISTS idx_flights_date ON flights(date);
 CREATE INDEX IF NOT EXISTS idx_flights_reg ON flights(reg);
 
+-- Distinct flight dates (DD/MM/YY text - sorted chronologically by the client)
+CREATE OR REPLACE FUNCTION flight_dates()
+RETURNS TABLE (date TEXT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT DISTINCT f.date FROM flights f;
+$$;
+
 -- 2. AC UTILIZATION TABLE (from SacutilReport CSV)
 CREATE TABLE IF NOT EXISTS ac_utilization (
     id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
@@ -58,6 +66,27 @@ CREATE TABLE IF NOT EXISTS rolling_hours (
 
 CREATE INDEX IF NOT EXISTS idx_rolling_crew ON rolling_hours(crew_id);
 CREATE INDEX IF NOT EXISTS idx_rolling_status ON rolling_hours(status);
+CREATE INDEX IF NOT EXISTS idx_rolling_hours_28day ON rolling_hours(hours_28day DESC);
+
+-- Dashboard read: top N crew by 28-day hours + counts per status in one call
+CREATE OR REPLACE FUNCTION rolling_hours_dashboard(top_n INTEGER DEFAULT 20)
+RETURNS JSON
+LANGUAGE sql STABLE
+AS $$
+    SELECT json_build_object(
+        'items', COALESCE((
+            SELECT json_agg(t) FROM (
+                SELECT * FROM rolling_hours ORDER BY hours_28day DESC LIMIT top_n
+            ) t
+        ), '[]'::json),
+        'counts', COALESCE((
+            SELECT json_object_agg(status, n) FROM (
+                SELECT LOWER(COALESCE(status, 'normal')) AS status, COUNT(*) AS n
+                FROM rolling_hours GROUP BY 1
+            ) c
+        ), '{}'::json)
+    );
+$$;
 
 -- 4. CREW SCHEDULE TABLE (from Crew Schedule CSV)
 CREATE TABLE IF NOT EXISTS crew_schedule (
@@ -65,9 +94,13 @@ CREATE TABLE IF NOT EXISTS crew_schedule (
     date TEXT NOT NULL,
     crew_id TEXT,
     status_type TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 1,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- One row per (date, status_type) carrying the count; existing tables need the column added
+ALTER TABLE crew_schedule ADD COLUMN IF NOT EXISTS count INTEGER NOT NULL DEFAULT 1;
+
 CREATE INDEX IF NOT EXISTS idx_crew_sched_date ON crew_schedule(date);
 CREATE INDEX IF NOT EXISTS idx_crew_sched_status ON crew_schedule(status_type);
 
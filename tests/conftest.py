@@ -0,0 +1,8 @@
+"""
+Shared pytest setup - makes the repo root importable (modules live at the top level)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,104 @@
+"""
+Tests for aims_soap_client.ttl_cache (TTL hits, stale fallback and its bound)
+"""
+
+import threading
+from collections import OrderedDict
+
+import pytest
+
+import aims_soap_client as aims
+
+TTL = 60
+
+
+class FakeClient:
+    """Just the attributes ttl_cache needs from AIMSSoapClient"""
+    def __init__(self):
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.outcome = {'success': True, 'items': [1]}
+        self.calls = 0
+    
+    @aims.ttl_cache('test')
+    def fetch(self, crew_id):
+        self.calls += 1
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return dict(self.outcome)
+    
+    def age_entries(self, seconds):
+        for key, (stored_at, result) in list(self._cache.items()):
+            self._cache[key] = (stored_at - seconds, result)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(aims._CACHE_POLICY, 'test', TTL)
+    return FakeClient()
+
+
+def test_fresh_entry_is_served_without_a_call(client):
+    client.fetch(1)
+    assert client.fetch(1) == {'success': True, 'items': [1]}
+    assert client.calls == 1
+
+
+def test_cached_result_is_a_copy(client):
+    client.fetch(1)['items'].append(2)
+    assert client.fetch(1)['items'] == [1]
+
+
+def test_failed_results_are_not_cached(client):
+    client.outcome = {'success': False, 'error': 'Fault'}
+    client.fetch(1)
+    client.fetch(1)
+    assert client.calls == 2
+
+
+def test_expired_entry_refetches(client):
+    client.fetch(1)
+    client.age_entries(TTL)
+    client.outcome = {'success': True, 'items': [2]}
+    assert client.fetch(1)['items'] == [2]
+    assert client.calls == 2
+
+
+@pytest.mark.parametrize('failure', [RuntimeError('AIMS down'), {'success': False, 'error': 'Fault'}])
+def test_stale_entry_covers_a_failed_call(client, failure):
+    client.fetch(1)
+    client.age_entries(TTL * 2)
+    client.outcome = failure
+    result = client.fetch(1)
+    assert result['stale'] is True
+    assert result['items'] == [1]
+
+
+def test_entry_past_max_stale_age_lets_the_exception_through(client):
+    client.fetch(1)
+    client.age_entries(TTL * aims._CACHE_MAX_STALE_FACTOR)
+    client.outcome = RuntimeError('AIMS down')
+    with pytest.raises(RuntimeError):
+        client.fetch(1)
+
+
+def test_entry_past_max_stale_age_returns_the_failed_result(client):
+    client.fetch(1)
+    client.age_entries(TTL * aims._CACHE_MAX_STALE_FACTOR)
+    client.outcome = {'success': False, 'error': 'Fault'}
+    assert client.fetch(1) == {'success': False, 'error': 'Fault'}
+
+
+def test_exception_without_any_entry_is_raised(client):
+    client.outcome = RuntimeError('AIMS down')
+    with pytest.raises(RuntimeError):
+        client.fetch(1)
+
+
+def test_lru_bound(client, monkeypatch):
+    monkeypatch.setattr(aims, '_CACHE_MAX_ENTRIES', 2)
+    for crew_id in (1, 2, 3):
+        client.fetch(crew_id)
+    assert len(client._cache) == 2
+    client.fetch(1)
+    assert client.calls == 4  # crew 1 was evicted
@@ -0,0 +1,46 @@
+"""
+Tests for crew_schedule rows carrying a count per (date, status_type)
+"""
+
+import pytest
+
+import data_processor
+import supabase_client as db
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    monkeypatch.setattr(db, 'is_connected', lambda: False)
+    return data_processor.DataProcessor()
+
+
+def test_sync_writes_one_row_per_status_with_count(processor, monkeypatch):
+    written = []
+    monkeypatch.setattr(db, 'insert_crew_schedule', lambda rows: written.extend(rows) or len(rows))
+    processor.crew_schedule_by_date['01/02/26'].update({'SL': 3, 'SBY': 2})
+    processor.crew_schedule_by_date['02/02/26'].update({'OSBY': 1})
+    
+    assert processor.sync_crew_schedule_to_db() == 3
+    assert sorted(written, key=lambda r: (r['date'], r['status_type'])) == [
+        {'date': '01/02/26', 'status_type': 'SBY', 'count': 2},
+        {'date': '01/02/26', 'status_type': 'SL', 'count': 3},
+        {'date': '02/02/26', 'status_type': 'OSBY', 'count': 1},
+    ]
+
+
+def test_sync_returns_none_when_insert_fails(processor, monkeypatch):
+    monkeypatch.setattr(db, 'insert_crew_schedule', lambda rows: None)
+    processor.crew_schedule_by_date['01/02/26']['SL'] = 1
+    assert processor.sync_crew_schedule_to_db() is None
+
+
+def test_summary_sums_counts_and_legacy_rows(monkeypatch):
+    rows = [
+        {'date': '01/02/26', 'status_type': 'SL', 'count': 3},
+        {'date': '01/02/26', 'status_type': 'SBY', 'count': 2},
+        {'date': '01/02/26', 'status_type': 'SBY'},  # legacy one-row-per-crew
+        {'date': '01/02/26', 'status_type': 'CSL', 'count': None},
+        {'date': '01/02/26', 'status_type': 'OTHER', 'count': 5},
+    ]
+    monkeypatch.setattr(db, 'get_crew_schedule', lambda filter_date=None: rows)
+    assert db.get_crew_schedule_summary() == {'SL': 3, 'CSL': 1, 'SBY': 3, 'OSBY': 0}
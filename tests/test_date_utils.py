@@ -0,0 +1,35 @@
+"""
+Tests for utils.date_utils.parse_time_to_minutes
+"""
+
+import pytest
+
+from utils.date_utils import parse_time_to_minutes
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('00:00', 0),
+    ('07:05', 425),
+    ('23:59', 1439),
+    ('7:05', 425),        # H:MM
+    ('0705', 425),        # HHMM
+    ('12:30:00', 750),    # seconds ignored
+    (' 08:10 ', 490),     # padded CSV cell
+])
+def test_parses_supported_formats(value, expected):
+    assert parse_time_to_minutes(value) == expected
+
+
+@pytest.mark.parametrize('value', [None, '', 'ab:cd', '12', 'abcd', '12:'])
+def test_rejects_non_times(value):
+    assert parse_time_to_minutes(value) is None
+
+
+def test_fast_path_rejects_non_ascii_digits():
+    # '²'.isdigit() is True, but it is not a digit the ord() arithmetic can read
+    assert parse_time_to_minutes('²3:00') is None
+
+
+def test_non_ascii_decimal_digits_take_the_int_path():
+    # Arabic-Indic digits are valid int() input - same result as the ASCII spelling
+    assert parse_time_to_minutes('٠٥:٣٠') == parse_time_to_minutes('05:30') == 330
@@ -0,0 +1,78 @@
+"""
+Tests for the CSV watcher's per-file debounce (file_watcher.CSVFileHandler)
+"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('watchdog')
+
+from file_watcher import CSVFileHandler
+
+DEBOUNCE = 0.05
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+        self.event = threading.Event()
+    
+    def __call__(self, file_path, event_type):
+        self.calls.append((file_path, event_type))
+        self.event.set()
+
+
+def wait_idle(handler, timeout=2.0):
+    """Wait until no timer is pending"""
+    deadline = time.monotonic() + timeout
+    while handler._timers and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(DEBOUNCE)
+
+
+def test_burst_of_events_fires_once_with_last_event_type():
+    recorder = Recorder()
+    handler = CSVFileHandler(recorder, debounce_seconds=DEBOUNCE)
+    
+    handler._schedule('DayRep.csv', 'created')
+    for _ in range(5):
+        handler._schedule('DayRep.csv', 'modified')
+    wait_idle(handler)
+    
+    assert recorder.calls == [('DayRep.csv', 'modified')]
+
+
+def test_files_are_debounced_independently():
+    recorder = Recorder()
+    handler = CSVFileHandler(recorder, debounce_seconds=DEBOUNCE)
+    
+    handler._schedule('DayRep.csv', 'modified')
+    handler._schedule('SacutilReport.csv', 'modified')
+    wait_idle(handler)
+    
+    assert sorted(recorder.calls) == [('DayRep.csv', 'modified'), ('SacutilReport.csv', 'modified')]
+
+
+def test_event_after_quiet_period_fires_again():
+    recorder = Recorder()
+    handler = CSVFileHandler(recorder, debounce_seconds=DEBOUNCE)
+    
+    handler._schedule('DayRep.csv', 'modified')
+    wait_idle(handler)
+    handler._schedule('DayRep.csv', 'modified')
+    wait_idle(handler)
+    
+    assert len(recorder.calls) == 2
+
+
+def test_cancel_pending_drops_unfired_callbacks():
+    recorder = Recorder()
+    handler = CSVFileHandler(recorder, debounce_seconds=0.5)
+    
+    handler._schedule('DayRep.csv', 'modified')
+    handler.cancel_pending()
+    
+    assert not recorder.event.wait(0.7)
+    assert recorder.calls == []
@@ -0,0 +1,131 @@
+"""
+Tests for supabase_client helpers, against a fake PostgREST client (no network)
+"""
+
+import pytest
+
+import supabase_client as db
+
+
+class FakeRpcError(Exception):
+    def __init__(self, code):
+        super().__init__(f"rpc error {code}")
+        self.code = code
+
+
+class FakeClient:
+    """Minimal client.rpc(name, params).execute().data stand-in"""
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = 0
+    
+    def rpc(self, name, params):
+        return self
+    
+    def execute(self):
+        self.calls += 1
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return type('Result', (), {'data': self.outcome})()
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    monkeypatch.setattr(db, '_missing_rpcs', {})
+    
+    def install(outcome):
+        client = FakeClient(outcome)
+        monkeypatch.setattr(db, 'supabase', client)
+        return client
+    return install
+
+
+def test_rpc_returns_data(fake_client):
+    fake_client([{'date': '01/02/26'}])
+    assert db._call_rpc('flight_dates') == [{'date': '01/02/26'}]
+
+
+@pytest.mark.parametrize('code', ['PGRST202', '42883', 404])
+def test_missing_function_is_not_retried(fake_client, code):
+    client = fake_client(FakeRpcError(code))
+    assert db._call_rpc('flight_dates') is None
+    assert db._call_rpc('flight_dates') is None
+    assert client.calls == 1
+
+
+def test_missing_function_is_retried_after_ttl(fake_client):
+    client = fake_client(FakeRpcError('PGRST202'))
+    db._call_rpc('flight_dates')
+    db._missing_rpcs['flight_dates'] -= db.RPC_MISSING_RETRY_SECONDS
+    client.outcome = [{'date': '01/02/26'}]
+    assert db._call_rpc('flight_dates') == [{'date': '01/02/26'}]
+    assert 'flight_dates' not in db._missing_rpcs
+
+
+def test_other_failures_are_not_cached(fake_client):
+    client = fake_client(FakeRpcError('57014'))  # statement timeout
+    assert db._call_rpc('flight_dates') is None
+    assert db._call_rpc('flight_dates') is None
+    assert client.calls == 2
+    assert not db._missing_rpcs
+
+
+class FakeTable:
+    """client.table(name).insert(rows).execute() / .delete().neq().execute() stand-in"""
+    def __init__(self, fail_batches=()):
+        self.fail_batches = set(fail_batches)
+        self.inserted = []
+        self.deleted = False
+    
+    def table(self, name):
+        return FakeQuery(self)
+
+
+class FakeQuery:
+    def __init__(self, client):
+        self.client = client
+        self.rows = None
+    
+    def insert(self, rows):
+        self.rows = rows
+        return self
+    
+    def delete(self):
+        self.client.deleted = True
+        return self
+    
+    def neq(self, *args):
+        return self
+    
+    def execute(self):
+        if self.rows is not None:
+            index = self.rows[0]['n'] // 2
+            self.client.inserted.append(index)
+            if index in self.client.fail_batches:
+                raise RuntimeError(f"batch {index} failed")
+
+
+def _rows(count):
+    return [{'n': n} for n in range(count)]
+
+
+def test_insert_batches_sends_every_batch():
+    client = FakeTable()
+    db._insert_batches(client, 'flights', _rows(6), batch_size=2)
+    assert sorted(client.inserted) == [0, 1, 2]
+
+
+def test_insert_batches_attempts_all_then_raises_first_error():
+    client = FakeTable(fail_batches={0, 2})
+    with pytest.raises(RuntimeError, match='batch 0 failed'):
+        db._insert_batches(client, 'flights', _rows(6), batch_size=2)
+    assert sorted(client.inserted) == [0, 1, 2]
+
+
+def test_insert_with_failed_batch_returns_none(monkeypatch):
+    client = FakeTable(fail_batches={1})
+    monkeypatch.setattr(db, 'supabase', client)
+    monkeypatch.setattr(db._insert_batches, '__defaults__', (2,))
+    assert db.insert_crew_schedule(_rows(6)) is None
+    assert client.deleted
+    assert sorted(client.inserted) == [0, 1, 2]
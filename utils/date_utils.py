@@ -134,6 +134,12 @@ def parse_time_to_minutes(time_str: str) -> Optional[int]:
     
     time_str = str(time_str).strip()
     
+    # Fast path for zero-padded ASCII "HH:MM" (called per flight/leg); isdigit() alone also accepts '²' etc.
+    if len(time_str) == 5 and time_str[2] == ':' and time_str.isascii() \
+            and time_str[:2].isdigit() and time_str[3:].isdigit():
+        return ((ord(time_str[0]) - 48) * 10 + ord(time_str[1]) - 48) * 60 \
+            + (ord(time_str[3]) - 48) * 10 + ord(time_str[4]) - 48
+    
     # Handle HH:MM format
     if ':' in time_str:
         parts = time_str.split(':')